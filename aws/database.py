@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 try:
     import psycopg2
     from psycopg2.extras import RealDictCursor
-    from psycopg2.pool import SimpleConnectionPool
+    from psycopg2.pool import ThreadedConnectionPool
     PSYCOPG2_AVAILABLE = True
 except ImportError:
     PSYCOPG2_AVAILABLE = False
@@ -23,7 +23,7 @@ class PredictionDatabase:
     
     def __init__(self, host: str, port: int = 5432, database: str = 'diamonddrip', 
                  user: str = None, password: str = None, pool_size: int = 5, 
-                 connect_timeout: int = 10):
+                 connect_timeout: int = 10, sslmode: Optional[str] = None):
         if not PSYCOPG2_AVAILABLE:
             raise ImportError("psycopg2 is required for PostgreSQL support. Install with: pip install psycopg2-binary")
         
@@ -34,10 +34,11 @@ class PredictionDatabase:
         self.password = password
         
         # Create connection pool for Lambda (reuse connections)
+        # Threaded pool: the async pulse-insert thread checks out connections alongside the request
         # Use longer timeout for VPC connections (default 10 seconds)
         try:
             print(f"Creating connection pool with timeout={connect_timeout}s, pool_size={pool_size}")
-            self.pool = SimpleConnectionPool(
+            self.pool = ThreadedConnectionPool(
                 minconn=1,
                 maxconn=pool_size,
                 host=host,
@@ -50,7 +51,9 @@ class PredictionDatabase:
                 keepalives=1,
                 keepalives_idle=30,
                 keepalives_interval=10,
-                keepalives_count=5
+                keepalives_count=5,
+                # Only pass sslmode when set so libpq's default (prefer) still applies
+                **({'sslmode': sslmode} if sslmode else {})
             )
             
             # Test the connection by initializing the database schema
@@ -257,35 +260,75 @@ class PredictionDatabase:
                     except:
                         pass
     
+    INSERT_PREDICTION_SQL = '''
+        INSERT INTO predictions (
+            client_timestamp, server_timestamp, current_bpm,
+            bpm_history, recent_pulse_patterns, recent_pulse_durations,
+            recent_correct_prediction_parts, recent_correct_prediction_durations,
+            current_prediction, current_prediction_durations, hashed_ip
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    '''
+    
+    @staticmethod
+    def _prediction_params(client_timestamp: str, server_timestamp: str,
+                           data: Dict[str, Any], hashed_ip: Optional[str]) -> tuple:
+        """Build the INSERT_PREDICTION_SQL parameters for a prediction record"""
+        return (
+            client_timestamp,
+            server_timestamp,
+            data.get('currentBPM'),
+            json.dumps(data.get('bpmHistory', [])),
+            json.dumps(data.get('recentPulsePatterns', [])),
+            json.dumps(data.get('recentPulseDurations')) if data.get('recentPulseDurations') is not None else None,
+            json.dumps(data.get('recentCorrectPredictionParts', [])),
+            json.dumps(data.get('recentCorrectPredictionDurations')) if data.get('recentCorrectPredictionDurations') is not None else None,
+            json.dumps(data.get('currentPrediction')),
+            json.dumps(data.get('currentPredictionDurations')) if data.get('currentPredictionDurations') is not None else None,
+            hashed_ip
+        )
+    
     def insert_prediction(self, client_timestamp: str, server_timestamp: str, 
                          data: Dict[str, Any], hashed_ip: Optional[str] = None) -> int:
         """Insert a prediction record into the database"""
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO predictions (
-                        client_timestamp, server_timestamp, current_bpm,
-                        bpm_history, recent_pulse_patterns, recent_pulse_durations,
-                        recent_correct_prediction_parts, recent_correct_prediction_durations,
-                        current_prediction, current_prediction_durations, hashed_ip
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    client_timestamp,
-                    server_timestamp,
-                    data.get('currentBPM'),
-                    json.dumps(data.get('bpmHistory', [])),
-                    json.dumps(data.get('recentPulsePatterns', [])),
-                    json.dumps(data.get('recentPulseDurations')) if data.get('recentPulseDurations') is not None else None,
-                    json.dumps(data.get('recentCorrectPredictionParts', [])),
-                    json.dumps(data.get('recentCorrectPredictionDurations')) if data.get('recentCorrectPredictionDurations') is not None else None,
-                    json.dumps(data.get('currentPrediction')),
-                    json.dumps(data.get('currentPredictionDurations')) if data.get('currentPredictionDurations') is not None else None,
-                    hashed_ip
-                ))
+                cursor.execute(self.INSERT_PREDICTION_SQL + ' RETURNING id',
+                               self._prediction_params(client_timestamp, server_timestamp, data, hashed_ip))
                 conn.commit()
                 return cursor.fetchone()[0]
     
+    def insert_prediction_and_get_window_stats(self, client_timestamp: str, server_timestamp: str,
+                                               data: Dict[str, Any], hashed_ip: Optional[str] = None
+                                               ) -> Tuple[Optional[float], int, int]:
+        """Insert a prediction and return last-20-second stats in one round trip
+        
+        Equivalent to insert_prediction() followed by get_average_bpm_last_20_seconds()
+        and get_unique_sources_last_20_seconds(). Rows inserted by a data-modifying CTE
+        aren't visible to the rest of the statement, so the new row is added explicitly.
+        
+        Returns:
+            Tuple of (avg_bpm, count, unique_sources)
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    WITH inserted AS (
+                        ''' + self.INSERT_PREDICTION_SQL + '''
+                        RETURNING current_bpm, hashed_ip
+                    ),
+                    recent AS (
+                        SELECT current_bpm, hashed_ip FROM predictions
+                        WHERE created_at >= NOW() - INTERVAL '20 seconds'
+                        UNION ALL
+                        SELECT current_bpm, hashed_ip FROM inserted
+                    )
+                    SELECT AVG(current_bpm), COUNT(current_bpm), COUNT(DISTINCT hashed_ip)
+                    FROM recent
+                ''', self._prediction_params(client_timestamp, server_timestamp, data, hashed_ip))
+                avg_bpm, count, unique_sources = cursor.fetchone()
+                conn.commit()
+                return avg_bpm, count, unique_sources
+    
     def get_recent_predictions(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent predictions from the database"""
         with self.get_connection() as conn:
@@ -11,14 +11,27 @@ import subprocess
 import boto3
 import time
 import json
+import hashlib
+import threading
 import argparse
 import secrets
 import string
 import importlib.util
 from pathlib import Path
 from datetime import datetime
+from botocore.config import Config
+from botocore.exceptions import WaiterError
+
+# orjson is optional - faster state file (de)serialization when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Import upload functions from upload-player-client.py
+# Note: spec_from_file_location uses SourceFileLoader, so these hyphenated sibling
+# scripts get __pycache__ bytecode like regular imports - no precompile step needed.
 def load_upload_module():
     """Load the upload-player-client module dynamically"""
     upload_script = Path(__file__).parent / 'upload-player-client.py'
@@ -66,6 +79,103 @@ def load_lambda_upload_module():
 
 lambda_upload_code, lambda_build_package = load_lambda_upload_module()
 
+# Shared boto3 session - credentials are resolved once per run instead of per client
+_session = None
+
+def get_session():
+    """Get the shared boto3 session, creating it on first use"""
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+# Adaptive retries add client-side rate limiting, so bursts of CloudFormation
+# calls back off instead of failing with Throttling errors. TCP keepalive stops
+# NAT/firewalls from reaping pooled connections during long stack waits.
+BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+    max_pool_connections=20
+)
+
+_clients = {}
+
+def get_client(service_name, region=None):
+    """Get a client from the shared session, reusing it across deploy steps"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = get_session().client(service_name, region_name=region, config=BOTO_CONFIG)
+    return _clients[key]
+
+def _base_parameters(cfg):
+    """Parameters shared by every stack"""
+    return {
+        'ProjectName': cfg['project'],
+        'Environment': cfg['env']
+    }
+
+def _database_parameters(cfg):
+    """Parameters for the database stack"""
+    return {
+        **_base_parameters(cfg),
+        'DatabaseInstanceClass': cfg['db_instance_class'],
+        'DatabaseAllocatedStorage': cfg['db_storage'],
+        'DatabaseMasterUsername': cfg['db_username'],
+        'DatabaseMasterPassword': cfg['db_password']
+    }
+
+def _application_parameters(cfg):
+    """Parameters for the application stack"""
+    return {
+        **_base_parameters(cfg),
+        'DatabaseMasterUsername': cfg['db_username'],
+        'DatabaseMasterPassword': cfg['db_password']
+    }
+
+# Stack definitions in deployment order.
+# Names are formatted and parameters built from the run configuration in main().
+STACK_SPECS = [
+    {
+        'key': 'network',
+        'name_template': '{project}-{env}-network',
+        'template': 'stacks/network.yaml',
+        'parameters': _base_parameters,
+        'capabilities': None
+    },
+    {
+        'key': 'database',
+        'name_template': '{project}-{env}-database',
+        'template': 'stacks/database.yaml',
+        'parameters': _database_parameters,
+        'capabilities': None
+    },
+    {
+        'key': 'application',
+        'name_template': '{project}-{env}-application',
+        'template': 'stacks/application.yaml',
+        'parameters': _application_parameters,
+        'capabilities': ['CAPABILITY_NAMED_IAM']
+    },
+    {
+        'key': 'frontend',
+        'name_template': '{project}-{env}-frontend',
+        'template': 'stacks/frontend.yaml',
+        'parameters': _base_parameters,
+        'capabilities': None
+    },
+    {
+        'key': 'diagnostics-frontend',
+        'name_template': '{project}-{env}-diagnostics-frontend',
+        'template': 'stacks/diagnostics-frontend.yaml',
+        'parameters': _base_parameters,
+        'capabilities': None
+    }
+]
+
+STACK_KEYS = [spec['key'] for spec in STACK_SPECS]
+
 def get_lambda_zip_file():
     """Get Lambda zip file, preferring docker-built version"""
     script_dir = Path(__file__).parent
@@ -92,7 +202,7 @@ def get_lambda_zip_file():
 def check_aws_credentials():
     """Check if AWS credentials are configured"""
     try:
-        client = boto3.client('sts')
+        client = get_client('sts')
         identity = client.get_caller_identity()
         print(f"✓ AWS Account: {identity.get('Account')}")
         print(f"✓ User/Role: {identity.get('Arn')}")
@@ -101,12 +211,104 @@ def check_aws_credentials():
         print(f"✗ AWS credentials error: {e}")
         return False
 
-def deploy_stack(template_file, stack_name, parameters, region, capabilities=None):
-    """Deploy a single CloudFormation stack with detailed progress"""
+def _fetch_new_stack_events(cf, stack_name, last_event_id, since):
+    """Fetch stack events newer than last_event_id (or than since, on the first poll)
+    
+    Events come back newest-first, so pagination stops at the first event that was
+    already seen instead of walking the stack's whole event history.
+    """
+    new_events = []
+    paginator = cf.get_paginator('describe_stack_events')
+    for page in paginator.paginate(StackName=stack_name):
+        for event in page['StackEvents']:
+            if event['EventId'] == last_event_id or event['Timestamp'].timestamp() < since:
+                return new_events
+            new_events.append(event)
+    return new_events
+
+def _progress_thread(cf, stack_name, stop_event, start_time, interval=30, max_interval=120):
+    """Print new stack events until stop_event is set
+    
+    Runs on a daemon thread so event fetching and printing stay off the waiter's
+    polling path. The poll interval doubles (up to max_interval) while no new
+    events arrive - e.g. during a long RDS instance creation - and resets as soon
+    as the stack starts producing events again.
+    """
+    last_event_id = None
+    # Allow for clock skew between this machine and CloudFormation event timestamps
+    since = start_time - 60
+    delay = interval
+    while not stop_event.wait(delay):
+        try:
+            new_events = _fetch_new_stack_events(cf, stack_name, last_event_id, since)
+        except Exception:
+            continue  # Ignore errors when fetching events
+        if stop_event.is_set():
+            break  # The wait finished while events were being fetched - don't print after its result
+        
+        if not new_events:
+            delay = min(delay * 2, max_interval)
+            continue
+        delay = interval
+        last_event_id = new_events[0]['EventId']
+        
+        elapsed = int(time.time() - start_time)
+        print(f"   [{elapsed // 60}m {elapsed % 60:02d}s] Progress:")
+        for event in reversed(new_events):
+            resource_id = event['LogicalResourceId']
+            resource_status = event['ResourceStatus']
+            if resource_status.endswith('_IN_PROGRESS'):
+                print(f"     → {resource_id}: {resource_status}")
+            elif resource_status.endswith('_COMPLETE'):
+                print(f"     ✓ {resource_id}: {resource_status}")
+            elif resource_status.endswith('FAILED'):
+                print(f"     ✗ {resource_id}: {resource_status}")
+                reason = event.get('ResourceStatusReason')
+                if reason:
+                    reason_short = reason[:80] + "..." if len(reason) > 80 else reason
+                    print(f"        {reason_short}")
+
+# Stack tag earlier versions stored the deploy fingerprint in. Stack tags propagate to every
+# resource, so the fingerprint now lives in the local deployment state file instead.
+LEGACY_DEPLOY_HASH_TAG = 'TemplateHash'
+
+def _deploy_fingerprint(template_body, parameters):
+    """SHA-256 of a template body and its parameter values (kept in the local state file only)"""
+    digest = hashlib.sha256(template_body.encode('utf-8'))
+    for key, value in sorted((parameters or {}).items()):
+        digest.update(f'\0{key}={value}'.encode('utf-8'))
+    return digest.hexdigest()
+
+# Hashes of template bodies that already passed validate_template
+VALIDATED_TEMPLATES_FILE = Path(__file__).parent / '.cfn-validated'
+
+def validate_template_cached(cf, template_body):
+    """Validate a template with CloudFormation unless this exact body already passed
+    
+    Raises ClientError if the template is invalid.
+    """
+    template_hash = hashlib.sha256(template_body.encode('utf-8')).hexdigest()
+    if VALIDATED_TEMPLATES_FILE.exists() and template_hash in VALIDATED_TEMPLATES_FILE.read_text().split():
+        return
+    cf.validate_template(TemplateBody=template_body)
+    with open(VALIDATED_TEMPLATES_FILE, 'a') as f:
+        f.write(template_hash + '\n')
+
+def deploy_stack(template_file, stack_name, parameters, region, capabilities=None, last_deploy_hash=None):
+    """Deploy a single CloudFormation stack with detailed progress
+    
+    last_deploy_hash is the fingerprint recorded in the local state file after the last
+    successful deploy - a healthy stack with a matching fingerprint is skipped.
+    
+    Returns (success, outputs, deploy_hash) - outputs come from the final describe_stacks call.
+    """
     print(f"\n🚀 Deploying stack: {stack_name}")
     print(f"   Template: {template_file}")
     
-    cf = boto3.client('cloudformation', region_name=region)
+    cf = get_client('cloudformation', region)
+    template_body = Path(template_file).read_text(encoding='utf-8')
+    deploy_hash = _deploy_fingerprint(template_body, parameters)
+    legacy_tags = None
     
     # Check if stack exists and its status
     stack_exists = False
@@ -126,72 +328,98 @@ def deploy_stack(template_file, stack_name, parameters, region, capabilities=Non
             
             # Wait for deletion to complete
             print(f"   ⏳ Waiting for deletion to complete...")
-            max_attempts = 60
-            delay = 10
-            
-            for attempt in range(max_attempts):
-                try:
-                    current_info = cf.describe_stacks(StackName=stack_name)
-                    current_status = current_info['Stacks'][0]['StackStatus']
-                    elapsed = attempt * delay
-                    print(f"   [{elapsed // 60}m {elapsed % 60:02d}s] Deletion status: {current_status}")
-                    
-                    if current_status == 'DELETE_COMPLETE':
-                        print(f"   ✓ Stack deleted successfully")
-                        stack_exists = False
-                        break
-                    elif current_status == 'DELETE_FAILED':
-                        print(f"   ✗ Stack deletion failed")
-                        return False
-                    
-                    time.sleep(delay)
-                except cf.exceptions.ClientError as e:
-                    if 'does not exist' in str(e):
-                        print(f"   ✓ Stack deleted successfully")
-                        stack_exists = False
-                        break
-                    raise
+            try:
+                cf.get_waiter('stack_delete_complete').wait(
+                    StackName=stack_name,
+                    WaiterConfig={'Delay': 10, 'MaxAttempts': 60}
+                )
+                print(f"   ✓ Stack deleted successfully")
+                stack_exists = False
+            except WaiterError as e:
+                if 'Max attempts exceeded' not in str(e):
+                    print(f"   ✗ Stack deletion failed")
+                    return False, {}, deploy_hash
             
             if stack_exists:
                 print(f"   ⚠️  Deletion timeout - stack may still be deleting")
                 print(f"   Please wait and try again, or delete manually from AWS Console")
-                return False
+                return False, {}, deploy_hash
             
             print(f"   Creating new stack...")
+        elif stack_status == 'REVIEW_IN_PROGRESS':
+            # Left behind by a CREATE change set that was never executed - it has no resources
+            # yet and only accepts another CREATE change set
+            print(f"   Stack is in REVIEW_IN_PROGRESS state (never created), creating...")
+            stack_exists = False
         elif stack_status in ['CREATE_COMPLETE', 'UPDATE_COMPLETE']:
+            if last_deploy_hash == deploy_hash:
+                print(f"   ✓ Template and parameters unchanged since last deploy, skipping")
+                return True, _parse_outputs(stack_info), deploy_hash
             print(f"   Stack exists, updating...")
         else:
             print(f"   Stack exists with status: {stack_status}, attempting update...")
+        
+        # Drop the fingerprint tag older deploys left on the stack (and so on every resource)
+        if stack_exists:
+            tags = stack_info['Stacks'][0].get('Tags', [])
+            if any(t['Key'] == LEGACY_DEPLOY_HASH_TAG for t in tags):
+                legacy_tags = [t for t in tags if t['Key'] != LEGACY_DEPLOY_HASH_TAG]
     except cf.exceptions.ClientError as e:
         if 'does not exist' in str(e):
             print(f"   Creating new stack...")
         else:
             raise
     
-    # Build command
-    cmd = [
-        'aws', 'cloudformation', 'deploy',
-        '--template-file', template_file,
-        '--stack-name', stack_name,
-        '--region', region,
-        '--no-fail-on-empty-changeset'
-    ]
-    
-    # Add parameters
-    if parameters:
-        param_overrides = []
-        for key, value in parameters.items():
-            param_overrides.append(f'{key}={value}')
-        cmd.extend(['--parameter-overrides'] + param_overrides)
-    
-    # Add capabilities
+    # Deploy through a change set - an empty change set means there is nothing to do
+    change_set_name = f"{stack_name}-{int(time.time())}"
+    change_set_args = {
+        'StackName': stack_name,
+        'ChangeSetName': change_set_name,
+        'ChangeSetType': 'UPDATE' if stack_exists else 'CREATE',
+        'TemplateBody': template_body,
+        'Parameters': [
+            {'ParameterKey': key, 'ParameterValue': str(value)}
+            for key, value in (parameters or {}).items()
+        ]
+    }
+    if legacy_tags is not None:
+        # An explicit (possibly empty) list replaces the stack tags; omitting it leaves them as-is
+        change_set_args['Tags'] = legacy_tags
     if capabilities:
-        cmd.extend(['--capabilities'] + capabilities)
+        change_set_args['Capabilities'] = capabilities
     
     # Deploy
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(f"   ✓ Deployment command completed")
+        start_time = time.time()
+        # Reject a broken template before a change set (or REVIEW_IN_PROGRESS stack) exists
+        validate_template_cached(cf, template_body)
+        cf.create_change_set(**change_set_args)
+        try:
+            cf.get_waiter('change_set_create_complete').wait(
+                StackName=stack_name,
+                ChangeSetName=change_set_name,
+                WaiterConfig={'Delay': 5, 'MaxAttempts': 60}
+            )
+        except WaiterError:
+            change_set = cf.describe_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+            reason = change_set.get('StatusReason', '')
+            if "didn't contain changes" in reason or 'No updates are to be performed' in reason:
+                cf.delete_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+                print(f"   ✓ No changes to deploy")
+                return True, _parse_outputs(stack_info), deploy_hash
+            print(f"   ✗ Change set failed: {reason}")
+            # Clean up so the next run starts fresh - a failed CREATE change set also leaves
+            # an empty REVIEW_IN_PROGRESS stack behind
+            try:
+                cf.delete_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+                if not stack_exists:
+                    cf.delete_stack(StackName=stack_name)
+            except cf.exceptions.ClientError as cleanup_error:
+                print(f"   ⚠️  Could not clean up failed change set: {cleanup_error}")
+            return False, {}, deploy_hash
+        
+        cf.execute_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+        print(f"   ✓ Change set executed")
         
         # Wait for stack to be ready with detailed progress
         print(f"\n   ⏳ Waiting for stack operation to complete...")
@@ -199,110 +427,104 @@ def deploy_stack(template_file, stack_name, parameters, region, capabilities=Non
             print(f"   NOTE: First deployment can take 10-15 minutes (especially for Database stack)")
             print(f"   Progress will be shown below:\n")
         
-        # Custom wait with progress updates
-        max_attempts = 90  # 15 minutes max
-        delay = 10
-        attempt = 0
-        last_seen_resources = set()
-        start_time = time.time()
-        
+        # Wait with the SDK waiter; progress events are printed from a background thread
         waiter_name = 'stack_update_complete' if stack_exists else 'stack_create_complete'
         
-        while attempt < max_attempts:
-            try:
-                # Check stack status
+        try:
+            stack_info = cf.describe_stacks(StackName=stack_name)
+            stack_status = stack_info['Stacks'][0]['StackStatus']
+            
+            if stack_status.endswith('_IN_PROGRESS'):
+                stop_event = threading.Event()
+                progress = threading.Thread(
+                    target=_progress_thread,
+                    args=(cf, stack_name, stop_event, start_time),
+                    daemon=True
+                )
+                progress.start()
+                try:
+                    cf.get_waiter(waiter_name).wait(
+                        StackName=stack_name,
+                        WaiterConfig={'Delay': 10, 'MaxAttempts': 90}  # 15 minutes max
+                    )
+                except WaiterError as e:
+                    if 'Max attempts exceeded' in str(e):
+                        print(f"\n   ⚠️  Timeout waiting for stack operation")
+                        print(f"   Stack may still be processing. Check AWS Console for status.")
+                        return False, {}, deploy_hash
+                    # Terminal failure state - fall through and report it below
+                finally:
+                    stop_event.set()
+                    progress.join()
+                
                 stack_info = cf.describe_stacks(StackName=stack_name)
                 stack_status = stack_info['Stacks'][0]['StackStatus']
-                
-                elapsed = int(time.time() - start_time)
-                elapsed_min = elapsed // 60
-                elapsed_sec = elapsed % 60
-                print(f"   [{elapsed_min}m {elapsed_sec:02d}s] Stack status: {stack_status}")
-                
-                # Check if complete
-                if stack_status.endswith('_COMPLETE'):
-                    if 'ROLLBACK' in stack_status or 'FAILED' in stack_status:
-                        print(f"\n   ✗ Stack operation failed: {stack_status}")
-                        # Get failure details
-                        try:
-                            events = cf.describe_stack_events(StackName=stack_name, MaxResults=10)
-                            print(f"   Recent events:")
-                            for event in events['StackEvents']:
-                                if event['ResourceStatus'].endswith('FAILED'):
-                                    print(f"     ✗ {event['LogicalResourceId']}: {event['ResourceStatus']}")
-                                    if event.get('ResourceStatusReason'):
-                                        reason = event['ResourceStatusReason'][:100]
-                                        print(f"        {reason}")
-                        except:
-                            pass
-                        return False
-                    print(f"\n   ✓ Stack operation completed successfully!")
-                    return True
-                
-                # Show resources being created/updated
-                if stack_status.endswith('_IN_PROGRESS'):
-                    try:
-                        events = cf.describe_stack_events(StackName=stack_name, MaxResults=20)
-                        current_resources = set()
-                        
-                        for event in events['StackEvents']:
-                            resource_id = event['LogicalResourceId']
-                            resource_status = event['ResourceStatus']
-                            
-                            # Show resources that are currently being created/updated
-                            if resource_status.endswith('_IN_PROGRESS'):
-                                if resource_id not in last_seen_resources:
-                                    print(f"     → {resource_id}: {resource_status}")
-                                current_resources.add(resource_id)
-                            elif resource_status.endswith('_COMPLETE'):
-                                if resource_id not in last_seen_resources:
-                                    print(f"     ✓ {resource_id}: {resource_status}")
-                                current_resources.add(resource_id)
-                            elif resource_status.endswith('FAILED'):
-                                if resource_id not in last_seen_resources:
-                                    reason = event.get('ResourceStatusReason', 'Unknown')
-                                    print(f"     ✗ {resource_id}: {resource_status}")
-                                    if reason:
-                                        reason_short = reason[:80] + "..." if len(reason) > 80 else reason
-                                        print(f"        {reason_short}")
-                                current_resources.add(resource_id)
-                        
-                        last_seen_resources = current_resources
-                    except Exception as e:
-                        pass  # Ignore errors when fetching events
-                
-                time.sleep(delay)
-                attempt += 1
-                
-            except cf.exceptions.ClientError as e:
-                if 'does not exist' in str(e):
-                    print(f"\n   ✗ Stack was deleted during operation")
-                    return False
-                raise
+        except cf.exceptions.ClientError as e:
+            if 'does not exist' in str(e):
+                print(f"\n   ✗ Stack was deleted during operation")
+                return False, {}, deploy_hash
+            raise
         
-        print(f"\n   ⚠️  Timeout waiting for stack operation")
-        print(f"   Stack may still be processing. Check AWS Console for status.")
-        return False
+        elapsed = int(time.time() - start_time)
+        print(f"   [{elapsed // 60}m {elapsed % 60:02d}s] Stack status: {stack_status}")
         
-    except subprocess.CalledProcessError as e:
-        print(f"   ✗ Deployment command failed: {e.stderr}")
-        return False
+        if 'ROLLBACK' in stack_status or 'FAILED' in stack_status or not stack_status.endswith('_COMPLETE'):
+            print(f"\n   ✗ Stack operation failed: {stack_status}")
+            # Get failure details
+            try:
+                events = cf.describe_stack_events(StackName=stack_name)
+                print(f"   Recent events:")
+                for event in events['StackEvents'][:10]:
+                    if event['ResourceStatus'].endswith('FAILED'):
+                        print(f"     ✗ {event['LogicalResourceId']}: {event['ResourceStatus']}")
+                        if event.get('ResourceStatusReason'):
+                            reason = event['ResourceStatusReason'][:100]
+                            print(f"        {reason}")
+            except:
+                pass
+            return False, {}, deploy_hash
+        
+        print(f"\n   ✓ Stack operation completed successfully!")
+        return True, _parse_outputs(stack_info), deploy_hash
+        
+    except cf.exceptions.ClientError as e:
+        print(f"   ✗ Deployment failed: {e}")
+        return False, {}, deploy_hash
     except Exception as e:
         print(f"   ✗ Error: {e}")
-        return False
+        return False, {}, deploy_hash
+
+def _parse_outputs(describe_response):
+    """Turn a describe_stacks response into an {OutputKey: OutputValue} dict"""
+    return {o['OutputKey']: o['OutputValue']
+            for o in describe_response['Stacks'][0].get('Outputs', [])}
 
 def get_stack_outputs(stack_name, region):
     """Get stack outputs"""
-    cf = boto3.client('cloudformation', region_name=region)
+    cf = get_client('cloudformation', region)
     try:
-        response = cf.describe_stacks(StackName=stack_name)
-        outputs = {o['OutputKey']: o['OutputValue'] 
-                  for o in response['Stacks'][0].get('Outputs', [])}
-        return outputs
+        return _parse_outputs(cf.describe_stacks(StackName=stack_name))
     except Exception as e:
         print(f"   ⚠ Could not get outputs: {e}")
         return {}
 
+def verify_bucket_file(bucket_name, key, region):
+    """Verify that a key file is present in an S3 bucket with a single HEAD request"""
+    s3 = get_client('s3', region)
+    try:
+        s3.head_object(Bucket=bucket_name, Key=key)
+        print(f"   ✓ Verified: {key} is present")
+        return True
+    except s3.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            print(f"   ⚠️  Warning: {key} not found in bucket")
+        else:
+            print(f"   ⚠️  Warning: Could not verify files in bucket: {e}")
+        return False
+    except Exception as e:
+        print(f"   ⚠️  Warning: Could not verify files in bucket: {e}")
+        return False
+
 def get_state_file(project_name, environment):
     """Get path to deployment state file"""
     return Path(f'deployment-state-{project_name}-{environment}.json')
@@ -371,8 +593,8 @@ def load_deployment_state(project_name, environment):
     state_file = get_state_file(project_name, environment)
     if state_file.exists():
         try:
-            with open(state_file, 'r') as f:
-                return json.load(f)
+            data = state_file.read_bytes()
+            return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
         except Exception as e:
             print(f"⚠️  Could not load state file: {e}")
             return {}
@@ -382,23 +604,28 @@ def save_deployment_state(project_name, environment, state):
     """Save deployment state to JSON file"""
     state_file = get_state_file(project_name, environment)
     try:
-        with open(state_file, 'w') as f:
-            json.dump(state, f, indent=2)
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(state, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(state, indent=2).encode('utf-8')
+        state_file.write_bytes(data)
     except Exception as e:
         print(f"⚠️  Could not save state file: {e}")
 
-def update_stack_state(state, stack_name, status, error=None, last_attempt_timestamp=None):
+def update_stack_state(state, stack_name, status, error=None, last_attempt_timestamp=None, deploy_hash=None):
     """Update state for a specific stack"""
     if 'stacks' not in state:
         state['stacks'] = {}
     
     current_time = datetime.now().isoformat()
     
-    # If stack entry exists, preserve last_attempt_timestamp if not provided
+    # If stack entry exists, preserve last_attempt_timestamp and deploy_hash if not provided
     if stack_name in state.get('stacks', {}):
         existing_entry = state['stacks'][stack_name]
         if last_attempt_timestamp is None:
             last_attempt_timestamp = existing_entry.get('last_attempt_timestamp')
+        if deploy_hash is None:
+            deploy_hash = existing_entry.get('deploy_hash')
     elif last_attempt_timestamp is None:
         # New deployment attempt - record the attempt time
         last_attempt_timestamp = current_time
@@ -407,7 +634,8 @@ def update_stack_state(state, stack_name, status, error=None, last_attempt_times
         'status': status,  # 'success', 'failed', 'skipped'
         'timestamp': current_time,
         'error': error,
-        'last_attempt_timestamp': last_attempt_timestamp
+        'last_attempt_timestamp': last_attempt_timestamp,
+        'deploy_hash': deploy_hash  # fingerprint of the last successful deploy's template + parameters
     }
     
     # Update last modified
@@ -419,9 +647,13 @@ def get_stack_status(state, stack_name):
         return None
     return state['stacks'].get(stack_name, {}).get('status')
 
+def get_stack_deploy_hash(state, stack_name):
+    """Get the template/parameter fingerprint of a stack's last successful deploy"""
+    return state.get('stacks', {}).get(stack_name, {}).get('deploy_hash')
+
 def verify_stack_exists(stack_name, region):
     """Verify if stack exists and is in a good state"""
-    cf = boto3.client('cloudformation', region_name=region)
+    cf = get_client('cloudformation', region)
     try:
         response = cf.describe_stacks(StackName=stack_name)
         status = response['Stacks'][0]['StackStatus']
@@ -470,11 +702,14 @@ Examples:
 
   # Deploy without CloudFront cache invalidation
   python deploy-stacks.py --all --no-invalidate
+
+  # Deploy frontend and verify the uploaded files in S3
+  python deploy-stacks.py --stack frontend --verify-upload
         """
     )
     
     parser.add_argument('--stack', '-s', action='append', 
-                       choices=['network', 'database', 'application', 'frontend', 'diagnostics-frontend'],
+                       choices=STACK_KEYS,
                        help='Deploy specific stack(s) (can be used multiple times)')
     parser.add_argument('--all', '-a', action='store_true',
                        help='Deploy all stacks, ignoring state file')
@@ -495,6 +730,8 @@ Examples:
                        help='Invalidate CloudFront cache after S3 uploads (default: enabled)')
     parser.add_argument('--no-invalidate', dest='invalidate', action='store_false',
                        help='Skip CloudFront cache invalidation after S3 uploads')
+    parser.add_argument('--verify-upload', action='store_true',
+                       help='Verify key files are present in S3 after uploads (default: disabled)')
     
     args = parser.parse_args()
     
@@ -537,59 +774,23 @@ Examples:
     db_instance_class = os.environ.get('DB_INSTANCE_CLASS', 'db.t3.micro')
     db_storage = os.environ.get('DB_STORAGE', '20')
     
-    # Stack definitions in deployment order
+    # Resolve stack names and parameters for this project/environment
+    stack_config = {
+        'project': project_name,
+        'env': environment,
+        'db_username': db_username,
+        'db_password': db_password,
+        'db_instance_class': db_instance_class,
+        'db_storage': db_storage
+    }
     all_stacks = {
-        'network': {
-            'name': f'{project_name}-{environment}-network',
-            'template': 'stacks/network.yaml',
-            'parameters': {
-                'ProjectName': project_name,
-                'Environment': environment
-            },
-            'capabilities': None
-        },
-        'database': {
-            'name': f'{project_name}-{environment}-database',
-            'template': 'stacks/database.yaml',
-            'parameters': {
-                'ProjectName': project_name,
-                'Environment': environment,
-                'DatabaseInstanceClass': db_instance_class,
-                'DatabaseAllocatedStorage': db_storage,
-                'DatabaseMasterUsername': db_username,
-                'DatabaseMasterPassword': db_password
-            },
-            'capabilities': None
-        },
-        'application': {
-            'name': f'{project_name}-{environment}-application',
-            'template': 'stacks/application.yaml',
-            'parameters': {
-                'ProjectName': project_name,
-                'Environment': environment,
-                'DatabaseMasterUsername': db_username,
-                'DatabaseMasterPassword': db_password
-            },
-            'capabilities': ['CAPABILITY_NAMED_IAM']
-        },
-        'frontend': {
-            'name': f'{project_name}-{environment}-frontend',
-            'template': 'stacks/frontend.yaml',
-            'parameters': {
-                'ProjectName': project_name,
-                'Environment': environment
-            },
-            'capabilities': None
-        },
-        'diagnostics-frontend': {
-            'name': f'{project_name}-{environment}-diagnostics-frontend',
-            'template': 'stacks/diagnostics-frontend.yaml',
-            'parameters': {
-                'ProjectName': project_name,
-                'Environment': environment
-            },
-            'capabilities': None
+        spec['key']: {
+            'name': spec['name_template'].format(**stack_config),
+            'template': spec['template'],
+            'parameters': spec['parameters'](stack_config),
+            'capabilities': spec['capabilities']
         }
+        for spec in STACK_SPECS
     }
     
     # Determine which stacks to deploy
@@ -629,6 +830,7 @@ Examples:
     
     deployed_stacks = []
     failed_stacks = []
+    deployed_outputs = {}  # stack name -> outputs returned by deploy_stack
     
     for i, (stack_key, stack) in enumerate(stacks_to_deploy, 1):
         print(f"\n[{i}/{len(stacks_to_deploy)}] {stack['name']}")
@@ -639,15 +841,18 @@ Examples:
         update_stack_state(state, stack['name'], 'in_progress', last_attempt_timestamp=attempt_timestamp)
         save_deployment_state(project_name, environment, state)
         
-        success = deploy_stack(
+        success, stack_outputs, deploy_hash = deploy_stack(
             stack['template'],
             stack['name'],
             stack['parameters'],
             region,
-            stack['capabilities']
+            stack['capabilities'],
+            last_deploy_hash=get_stack_deploy_hash(state, stack['name'])
         )
         
         if success:
+            deployed_outputs[stack['name']] = stack_outputs
+            
             # If this is the application stack, build and upload Lambda code
             if stack_key == 'application':
                 print(f"\n[BUILD] Building Lambda package with Docker (Linux wheels)...")
@@ -656,24 +861,26 @@ Examples:
                     build_script = Path(__file__).parent / 'build-lambda-docker.py'
                     if build_script.exists():
                         print(f"   Running: python {build_script.name}")
-                        build_result = subprocess.run(
+                        # Stream the build output as it arrives (stderr merged into stdout)
+                        build_proc = subprocess.Popen(
                             [sys.executable, str(build_script)],
                             cwd=Path(__file__).parent,
-                            capture_output=True,
-                            text=True
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            text=True,
+                            errors='replace',
+                            bufsize=1,
+                            env={**os.environ, 'PYTHONUNBUFFERED': '1'}
                         )
+                        for line in build_proc.stdout:
+                            if line.strip():
+                                print(f"   | {line.rstrip()}")
+                        build_proc.wait()
                         
-                        if build_result.returncode == 0:
+                        if build_proc.returncode == 0:
                             print(f"   ✓ Lambda package built successfully with Docker")
-                            # Print any important output
-                            if build_result.stdout:
-                                for line in build_result.stdout.split('\n'):
-                                    if line.strip() and ('Package location' in line or 'Package size' in line):
-                                        print(f"   {line.strip()}")
                         else:
-                            print(f"   ⚠️  Warning: Docker build failed")
-                            if build_result.stderr:
-                                print(f"   Error: {build_result.stderr[:200]}")
+                            print(f"   ⚠️  Warning: Docker build failed (exit code {build_proc.returncode})")
                             print(f"   Will try to use existing package if available...")
                     else:
                         print(f"   ⚠️  Warning: build-lambda-docker.py not found, skipping Docker build")
@@ -684,7 +891,7 @@ Examples:
                 print(f"\n[UPLOAD] Uploading Lambda function code...")
                 try:
                     # Get Lambda function name from stack outputs
-                    app_outputs = get_stack_outputs(stack['name'], region)
+                    app_outputs = stack_outputs
                     function_name = app_outputs.get('LambdaFunctionName')
                     
                     if function_name:
@@ -692,7 +899,11 @@ Examples:
                             # Get zip file (prefer docker zip, fallback to building)
                             zip_file = get_lambda_zip_file()
                             if zip_file:
-                                upload_success = lambda_upload_code(function_name, zip_file, region)
+                                upload_success = lambda_upload_code(
+                                    function_name, zip_file, region,
+                                    session=get_session(),
+                                    s3_bucket=os.environ.get('LAMBDA_ARTIFACT_BUCKET')
+                                )
                                 if upload_success:
                                     print(f"   ✓ Lambda code uploaded successfully")
                                 else:
@@ -717,13 +928,14 @@ Examples:
                 print(f"\n[UPLOAD] Uploading frontend files to S3...")
                 try:
                     # Get bucket name from stack outputs
-                    frontend_outputs = get_stack_outputs(stack['name'], region)
+                    frontend_outputs = stack_outputs
                     bucket_name = frontend_outputs.get('PlayerClientBucketName')
                     distribution_id = frontend_outputs.get('PlayerClientDistributionId')
                     
                     if bucket_name:
                         # Get API endpoint for config update
-                        app_outputs = get_stack_outputs(f'{project_name}-{environment}-application', region)
+                        app_outputs = (deployed_outputs.get(f'{project_name}-{environment}-application') or
+                                       get_stack_outputs(f'{project_name}-{environment}-application', region))
                         api_endpoint = app_outputs.get('ApiEndpoint') if app_outputs else None
                         
                         # Upload files
@@ -732,24 +944,10 @@ Examples:
                             if upload_success:
                                 print(f"   ✓ Files uploaded successfully to S3 bucket: {bucket_name}")
                                 
-                                # Verify files are actually in the bucket
-                                print(f"   [VERIFY] Verifying files in S3 bucket...")
-                                try:
-                                    s3 = boto3.client('s3', region_name=region)
-                                    response = s3.list_objects_v2(Bucket=bucket_name, MaxKeys=20)
-                                    if 'Contents' in response:
-                                        file_count = len(response['Contents'])
-                                        print(f"   ✓ Verified: {file_count} file(s) found in bucket")
-                                        # List key files
-                                        key_files = [obj['Key'] for obj in response['Contents']]
-                                        if 'index.html' in key_files:
-                                            print(f"   ✓ Verified: index.html is present")
-                                        else:
-                                            print(f"   ⚠️  Warning: index.html not found in bucket")
-                                    else:
-                                        print(f"   ⚠️  Warning: No files found in bucket (may be empty)")
-                                except Exception as e:
-                                    print(f"   ⚠️  Warning: Could not verify files in bucket: {e}")
+                                # Verify files are actually in the bucket (opt-in)
+                                if args.verify_upload:
+                                    print(f"   [VERIFY] Verifying files in S3 bucket...")
+                                    verify_bucket_file(bucket_name, 'index.html', region)
                                 
                                 # Invalidate CloudFront cache if requested
                                 if args.invalidate and distribution_id and invalidate_cloudfront:
@@ -776,13 +974,14 @@ Examples:
                 print(f"\n[UPLOAD] Uploading diagnostics files to S3...")
                 try:
                     # Get bucket name from stack outputs
-                    diagnostics_outputs = get_stack_outputs(stack['name'], region)
+                    diagnostics_outputs = stack_outputs
                     bucket_name = diagnostics_outputs.get('DiagnosticsClientBucketName')
                     distribution_id = diagnostics_outputs.get('DiagnosticsClientDistributionId')
                     
                     if bucket_name:
                         # Get API endpoint for config update
-                        app_outputs = get_stack_outputs(f'{project_name}-{environment}-application', region)
+                        app_outputs = (deployed_outputs.get(f'{project_name}-{environment}-application') or
+                                       get_stack_outputs(f'{project_name}-{environment}-application', region))
                         api_endpoint = app_outputs.get('ApiEndpoint') if app_outputs else None
                         
                         # Upload files
@@ -791,24 +990,10 @@ Examples:
                             if upload_success:
                                 print(f"   ✓ Files uploaded successfully to S3 bucket: {bucket_name}")
                                 
-                                # Verify files are actually in the bucket
-                                print(f"   [VERIFY] Verifying files in S3 bucket...")
-                                try:
-                                    s3 = boto3.client('s3', region_name=region)
-                                    response = s3.list_objects_v2(Bucket=bucket_name, MaxKeys=20)
-                                    if 'Contents' in response:
-                                        file_count = len(response['Contents'])
-                                        print(f"   ✓ Verified: {file_count} file(s) found in bucket")
-                                        # List key files
-                                        key_files = [obj['Key'] for obj in response['Contents']]
-                                        if 'diagnostic.html' in key_files:
-                                            print(f"   ✓ Verified: diagnostic.html is present")
-                                        else:
-                                            print(f"   ⚠️  Warning: diagnostic.html not found in bucket")
-                                    else:
-                                        print(f"   ⚠️  Warning: No files found in bucket (may be empty)")
-                                except Exception as e:
-                                    print(f"   ⚠️  Warning: Could not verify files in bucket: {e}")
+                                # Verify files are actually in the bucket (opt-in)
+                                if args.verify_upload:
+                                    print(f"   [VERIFY] Verifying files in S3 bucket...")
+                                    verify_bucket_file(bucket_name, 'diagnostic.html', region)
                                 
                                 # Invalidate CloudFront cache if requested
                                 if args.invalidate and distribution_id and invalidate_diagnostics_cloudfront:
@@ -830,7 +1015,8 @@ Examples:
                     print(f"   ⚠️  Warning: Failed to upload files automatically: {e}")
                     print(f"      Run manually: python upload-diagnostics-client.py --stack-name {stack['name']} --invalidate")
             
-            update_stack_state(state, stack['name'], 'success', last_attempt_timestamp=attempt_timestamp)
+            update_stack_state(state, stack['name'], 'success', last_attempt_timestamp=attempt_timestamp,
+                               deploy_hash=deploy_hash)
             deployed_stacks.append(stack['name'])
         else:
             error_msg = f"Deployment failed for {stack['name']}"
@@ -868,9 +1054,12 @@ Examples:
         print("=" * 60)
         
         # Get final outputs
-        app_outputs = get_stack_outputs(f'{project_name}-{environment}-application', region)
-        frontend_outputs = get_stack_outputs(f'{project_name}-{environment}-frontend', region)
-        diagnostics_outputs = get_stack_outputs(f'{project_name}-{environment}-diagnostics-frontend', region)
+        app_outputs = (deployed_outputs.get(f'{project_name}-{environment}-application') or
+                       get_stack_outputs(f'{project_name}-{environment}-application', region))
+        frontend_outputs = (deployed_outputs.get(f'{project_name}-{environment}-frontend') or
+                            get_stack_outputs(f'{project_name}-{environment}-frontend', region))
+        diagnostics_outputs = (deployed_outputs.get(f'{project_name}-{environment}-diagnostics-frontend') or
+                               get_stack_outputs(f'{project_name}-{environment}-diagnostics-frontend', region))
         
         if app_outputs:
             print(f"\n📡 API Endpoint:")
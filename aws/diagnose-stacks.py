@@ -7,106 +7,225 @@ import boto3
 import sys
 import json
 import os
+import io
+import bisect
+import itertools
 import argparse
+import threading
 from datetime import datetime
 from collections import defaultdict
+from dataclasses import dataclass
 from pathlib import Path
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 
-def get_all_stacks(project_name, environment, region):
-    """Get all stacks for the project"""
-    cf = boto3.client('cloudformation', region_name=region)
+# orjson is optional - faster event export (with native datetime support) when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Section separator used throughout the reports
+BANNER = '=' * 70
+
+# Stacks are diagnosed concurrently - the work is almost all waiting on the API.
+# Threads are enough for the handful of stacks a project has (event pages within
+# a stack are sequential anyway, NextToken-chained), and the worker cap keeps
+# bursts well inside CloudFormation's API rate limits.
+MAX_DIAGNOSE_WORKERS = 8
+
+# boto3 clients and the default session are not safe to create or share across
+# threads, so each worker thread gets its own session and client
+_thread_local = threading.local()
+
+def get_cf_client(region):
+    """Get this thread's CloudFormation client for a region"""
+    clients = getattr(_thread_local, 'clients', None)
+    if clients is None:
+        clients = _thread_local.clients = {}
+    if region not in clients:
+        clients[region] = boto3.session.Session().client('cloudformation', region_name=region)
+    return clients[region]
+
+# Stack statuses --failed-only cares about (FAILED or ROLLBACK); list_stacks
+# filters on these server-side, so DELETE_COMPLETE history is never returned
+FAILED_STACK_STATUSES = [
+    'CREATE_FAILED', 'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED', 'ROLLBACK_COMPLETE',
+    'DELETE_FAILED', 'UPDATE_FAILED', 'UPDATE_ROLLBACK_IN_PROGRESS', 'UPDATE_ROLLBACK_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
+    'IMPORT_ROLLBACK_IN_PROGRESS', 'IMPORT_ROLLBACK_FAILED', 'IMPORT_ROLLBACK_COMPLETE'
+]
+
+def get_all_stacks(project_name, environment, region, failed_only=False):
+    """Get all stacks for the project (only failed/rolled-back ones if failed_only)"""
+    cf = get_cf_client(region)
     
     stack_prefix = f"{project_name}-{environment}-"
     stacks = []
     
     try:
-        paginator = cf.get_paginator('list_stacks')
-        for page in paginator.paginate():
-            for stack_summary in page['StackSummaries']:
-                stack_name = stack_summary['StackName']
-                if stack_name.startswith(stack_prefix):
-                    try:
-                        stack_info = cf.describe_stacks(StackName=stack_name)['Stacks'][0]
-                        stacks.append(stack_info)
-                    except ClientError:
-                        stacks.append({
-                            'StackName': stack_name,
-                            'StackStatus': stack_summary['StackStatus'],
-                            'CreationTime': stack_summary.get('CreationTime'),
-                            'LastUpdatedTime': stack_summary.get('LastUpdatedTime')
-                        })
+        if failed_only:
+            # describe_stacks has no status filter - list_stacks does
+            paginator = cf.get_paginator('list_stacks')
+            pages = paginator.paginate(StackStatusFilter=FAILED_STACK_STATUSES)
+            key = 'StackSummaries'
+        else:
+            # describe_stacks returns full stack details per page - no per-stack lookup needed
+            paginator = cf.get_paginator('describe_stacks')
+            pages = paginator.paginate()
+            key = 'Stacks'
+        for page in pages:
+            for stack_info in page[key]:
+                if stack_info['StackName'].startswith(stack_prefix):
+                    stacks.append(stack_info)
     except Exception as e:
         print(f"Error listing stacks: {e}")
         return []
     
     return stacks
 
-def get_stack_events(stack_name, region, max_events=100, since_timestamp=None):
-    """Get stack events, optionally filtered by timestamp"""
-    cf = boto3.client('cloudformation', region_name=region)
+def parse_since_timestamp(since_timestamp):
+    """Turn a since-timestamp (ISO string or datetime) into a timezone-aware datetime
+    
+    Naive values are local times, as written by deploy-stacks.py's datetime.now().
+    """
+    if isinstance(since_timestamp, str):
+        since_timestamp = datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
+    if since_timestamp.tzinfo is None:
+        since_timestamp = since_timestamp.astimezone()
+    return since_timestamp
+
+def iter_stack_events(stack_name, region, max_events=100, since_timestamp=None, stop_at_event_id=None):
+    """Yield stack events most recent first, optionally only those since a timestamp
     
-    events = []
-    try:
-        paginator = cf.get_paginator('describe_stack_events')
-        for page in paginator.paginate(StackName=stack_name):
-            events.extend(page['StackEvents'])
-            if len(events) >= max_events * 2:  # Get more to filter
-                break
-    except ClientError as e:
-        if 'does not exist' in str(e):
-            return []
-        raise
+    CloudFormation already returns events newest first, so no sorting is needed
+    and paging stops at the first event older than since_timestamp, once
+    max_events have been yielded, or at stop_at_event_id (already seen).
+    """
+    cf = get_cf_client(region)
     
-    # Filter by timestamp if provided
+    since_dt = None
     if since_timestamp:
         try:
-            if isinstance(since_timestamp, str):
-                since_dt = datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
-            else:
-                since_dt = since_timestamp
-            
-            filtered_events = []
-            for event in events:
-                event_time = event.get('Timestamp')
-                if event_time:
-                    # Handle timezone-aware and naive datetimes
-                    if isinstance(event_time, str):
-                        event_dt = datetime.fromisoformat(event_time.replace('Z', '+00:00'))
-                    else:
-                        event_dt = event_time
-                    
-                    # Compare timestamps (handle timezone differences)
-                    if isinstance(since_dt, datetime) and isinstance(event_dt, datetime):
-                        # Make both timezone-aware or both naive for comparison
-                        if since_dt.tzinfo is None and event_dt.tzinfo is not None:
-                            event_dt = event_dt.replace(tzinfo=None)
-                        elif since_dt.tzinfo is not None and event_dt.tzinfo is None:
-                            event_dt = event_dt.replace(tzinfo=since_dt.tzinfo)
-                        
-                        if event_dt >= since_dt:
-                            filtered_events.append(event)
-            events = filtered_events
-        except Exception as e:
+            since_dt = parse_since_timestamp(since_timestamp)
+        except (ValueError, TypeError) as e:
             # If timestamp parsing fails, use all events
             print(f"   ⚠️  Could not filter by timestamp: {e}, showing all events")
     
-    # Sort by timestamp (most recent first)
-    events.sort(key=lambda x: x.get('Timestamp', datetime.min), reverse=True)
-    return events[:max_events]
+    count = 0
+    try:
+        # describe_stack_events has no page-size parameter (the service sizes the
+        # pages and botocore rejects PageSize), so round trips are saved by
+        # stopping early rather than by asking for bigger pages
+        paginator = cf.get_paginator('describe_stack_events')
+        for page in paginator.paginate(StackName=stack_name):
+            page_events = page['StackEvents']
+            cutoff = len(page_events)
+            if since_dt:
+                # Timestamps descend within a page, so binary-search the cutoff
+                # (botocore already returns tz-aware datetimes - no parsing)
+                cutoff = bisect.bisect_right(
+                    page_events, -since_dt.timestamp(),
+                    key=lambda e: -e['Timestamp'].timestamp()
+                )
+            for event in page_events[:cutoff]:
+                if event['EventId'] == stop_at_event_id:
+                    return
+                yield event
+                count += 1
+                if count >= max_events:
+                    return
+            if cutoff < len(page_events):
+                return  # Reached events from before since_timestamp
+    except ClientError as e:
+        if 'does not exist' in str(e):
+            return
+        raise
+
+# ResourceStatus -> (bucket, is_rollback). There are only a few dozen distinct
+# statuses, so each is classified once and then looked up.
+_STATUS_CLASS = {}
+
+def classify_status(status):
+    """Classify a resource status as failed/in_progress/complete/deleted (or None)"""
+    cls = _STATUS_CLASS.get(status)
+    if cls is None:
+        if status.endswith('FAILED'):
+            bucket = 'failed'
+        elif status.endswith('_IN_PROGRESS'):
+            bucket = 'in_progress'
+        elif status.endswith('_COMPLETE'):
+            bucket = 'deleted' if status.startswith('DELETE') else 'complete'
+        else:
+            bucket = None
+        cls = _STATUS_CLASS[status] = (bucket, 'ROLLBACK' in status)
+    return cls
+
+# Failure reason keywords per error category, checked in priority order
+REASON_KEYWORDS = (
+    ('permissions', ('not authorized', 'access denied')),
+    ('limits', ('limit', 'quota')),
+    ('conflicts', ('already exists',)),
+    ('timeouts', ('timeout',)),
+)
+
+def classify_reason(reason):
+    """Categorize a failure reason (lowercased once, then substring checks)"""
+    reason_lc = reason.lower()
+    for category, keywords in REASON_KEYWORDS:
+        if any(keyword in reason_lc for keyword in keywords):
+            return category
+    return 'other'
+
+@dataclass(slots=True, frozen=True)
+class TimelineEvent:
+    """One stack event in the report timeline"""
+    timestamp: datetime
+    resource: str
+    status: str
+    type: str
+    reason: str
+
+@dataclass(slots=True, frozen=True)
+class FailedResource:
+    """Most recent failure of a resource"""
+    resource_id: str
+    resource_type: str
+    status: str
+    reason: str
+    timestamp: datetime
+
+@dataclass(slots=True, frozen=True)
+class InProgressResource:
+    """Resource whose latest event is still in progress"""
+    resource_id: str
+    resource_type: str
+    status: str
 
-def analyze_events(events):
-    """Analyze stack events to identify issues"""
+# Number of events shown in the verbose timeline
+TIMELINE_LENGTH = 20
+
+def analyze_events(events, verbose=False):
+    """Analyze stack events (any iterable, consumed once) to identify issues
+    
+    The timeline and the completed resource list are only printed in verbose
+    mode, so otherwise they are not built (completed resources are counted).
+    """
     analysis = {
+        'event_count': 0,
         'failed_resources': [],
         'in_progress_resources': [],
+        'completed_count': 0,
         'completed_resources': [],
         'warnings': [],
         'errors_by_type': defaultdict(list),
         'timeline': []
     }
     
-    seen_resources = set()
+    # Newest failure per resource (events arrive newest first); dict order
+    # gives the failed list, and membership suppresses older entries
+    failed_by_resource = {}
     
     for event in events:
         resource_id = event['LogicalResourceId']
@@ -114,126 +233,142 @@ def analyze_events(events):
         resource_type = event.get('ResourceType', 'Unknown')
         timestamp = event.get('Timestamp', '')
         reason = event.get('ResourceStatusReason', '')
+        bucket, is_rollback = classify_status(resource_status)
+        analysis['event_count'] += 1
         
         # Build timeline
-        analysis['timeline'].append({
-            'timestamp': timestamp,
-            'resource': resource_id,
-            'status': resource_status,
-            'type': resource_type,
-            'reason': reason
-        })
+        if verbose and len(analysis['timeline']) < TIMELINE_LENGTH:
+            analysis['timeline'].append(
+                TimelineEvent(timestamp, resource_id, resource_status, resource_type, reason)
+            )
         
         # Track failed resources
-        if resource_status.endswith('FAILED'):
-            if resource_id not in seen_resources:
-                analysis['failed_resources'].append({
-                    'resource_id': resource_id,
-                    'resource_type': resource_type,
-                    'status': resource_status,
-                    'reason': reason,
-                    'timestamp': timestamp
-                })
-                seen_resources.add(resource_id)
+        if bucket == 'failed':
+            if resource_id not in failed_by_resource:
+                failed_by_resource[resource_id] = FailedResource(
+                    resource_id, resource_type, resource_status, reason, timestamp
+                )
                 
                 # Categorize errors
-                if 'not authorized' in reason.lower() or 'access denied' in reason.lower():
-                    analysis['errors_by_type']['permissions'].append({
-                        'resource': resource_id,
-                        'reason': reason
-                    })
-                elif 'limit' in reason.lower() or 'quota' in reason.lower():
-                    analysis['errors_by_type']['limits'].append({
-                        'resource': resource_id,
-                        'reason': reason
-                    })
-                elif 'already exists' in reason.lower():
-                    analysis['errors_by_type']['conflicts'].append({
-                        'resource': resource_id,
-                        'reason': reason
-                    })
-                elif 'timeout' in reason.lower():
-                    analysis['errors_by_type']['timeouts'].append({
-                        'resource': resource_id,
-                        'reason': reason
-                    })
-                else:
-                    analysis['errors_by_type']['other'].append({
-                        'resource': resource_id,
-                        'reason': reason
-                    })
+                analysis['errors_by_type'][classify_reason(reason)].append({
+                    'resource': resource_id,
+                    'reason': reason
+                })
         
         # Track in-progress resources
-        elif resource_status.endswith('_IN_PROGRESS'):
-            if resource_id not in seen_resources:
-                analysis['in_progress_resources'].append({
-                    'resource_id': resource_id,
-                    'resource_type': resource_type,
-                    'status': resource_status
-                })
+        elif bucket == 'in_progress':
+            if resource_id not in failed_by_resource:
+                analysis['in_progress_resources'].append(
+                    InProgressResource(resource_id, resource_type, resource_status)
+                )
         
         # Track completed resources
-        elif resource_status.endswith('_COMPLETE'):
-            if resource_id not in seen_resources and not resource_status.startswith('DELETE'):
-                analysis['completed_resources'].append({
-                    'resource_id': resource_id,
-                    'resource_type': resource_type
-                })
+        elif bucket == 'complete':
+            if resource_id not in failed_by_resource:
+                analysis['completed_count'] += 1
+                if verbose:
+                    analysis['completed_resources'].append({
+                        'resource_id': resource_id,
+                        'resource_type': resource_type
+                    })
         
         # Track warnings
-        if 'ROLLBACK' in resource_status and resource_id != event.get('StackName', ''):
+        if is_rollback and resource_id != event.get('StackName', ''):
             analysis['warnings'].append({
                 'resource': resource_id,
                 'status': resource_status,
                 'reason': reason
             })
     
+    analysis['failed_resources'] = list(failed_by_resource.values())
     return analysis
 
+# Static troubleshooting tips per error category. Permission tips also list the
+# services seen in the failure reasons, between the head and tail lines.
+PERMISSION_TIPS_HEAD = (
+    "🔐 Permission Issues Detected:",
+    "   1. Check IAM permissions for the deployment user/role",
+    "   2. Verify the deployment permissions policy includes:",
+)
+PERMISSION_TIPS_TAIL = (
+    "   3. Run: python deploy-stacks.py --help to see required permissions",
+    "   4. Check if service-linked roles need to be created",
+)
+TROUBLESHOOTING_TIPS = {
+    'limits': (
+        "📊 Service Limits Exceeded:",
+        "   1. Check AWS Service Quotas console",
+        "   2. Common limits:",
+        "      - VPCs per region (default: 5)",
+        "      - NAT Gateways per AZ (default: 5)",
+        "      - RDS instances per region",
+        "   3. Request limit increases if needed",
+        "   4. Delete unused resources to free up quota",
+    ),
+    'conflicts': (
+        "⚠️  Resource Conflicts:",
+        "   1. Resource name may already exist",
+        "   2. Check if resource exists in another stack",
+        "   3. Use different naming or delete conflicting resource",
+        "   4. Check for duplicate stack deployments",
+    ),
+    'timeouts': (
+        "⏱️  Timeout Issues:",
+        "   1. Some resources take longer to create (RDS, NAT Gateway)",
+        "   2. Check if operation is still in progress",
+        "   3. Increase CloudFormation timeout if needed",
+        "   4. Check AWS service health dashboard",
+    ),
+}
+
 def get_troubleshooting_tips(error_type, errors):
     """Get troubleshooting tips based on error type"""
-    tips = []
-    
-    if error_type == 'permissions':
-        tips.append("🔐 Permission Issues Detected:")
-        tips.append("   1. Check IAM permissions for the deployment user/role")
-        tips.append("   2. Verify the deployment permissions policy includes:")
-        for error in errors[:3]:  # Show first 3 examples
-            if 'rds:' in error['reason']:
-                tips.append("      - RDS permissions (CreateDBSnapshot, DeleteDBInstance, etc.)")
-            elif 'iam:' in error['reason']:
-                tips.append("      - IAM permissions (PassRole, CreateRole, etc.)")
-            elif 'ec2:' in error['reason']:
-                tips.append("      - EC2 permissions (CreateVpc, CreateSubnet, etc.)")
-        tips.append("   3. Run: python deploy-stacks.py --help to see required permissions")
-        tips.append("   4. Check if service-linked roles need to be created")
-    
-    elif error_type == 'limits':
-        tips.append("📊 Service Limits Exceeded:")
-        tips.append("   1. Check AWS Service Quotas console")
-        tips.append("   2. Common limits:")
-        tips.append("      - VPCs per region (default: 5)")
-        tips.append("      - NAT Gateways per AZ (default: 5)")
-        tips.append("      - RDS instances per region")
-        tips.append("   3. Request limit increases if needed")
-        tips.append("   4. Delete unused resources to free up quota")
-    
-    elif error_type == 'conflicts':
-        tips.append("⚠️  Resource Conflicts:")
-        tips.append("   1. Resource name may already exist")
-        tips.append("   2. Check if resource exists in another stack")
-        tips.append("   3. Use different naming or delete conflicting resource")
-        tips.append("   4. Check for duplicate stack deployments")
-    
-    elif error_type == 'timeouts':
-        tips.append("⏱️  Timeout Issues:")
-        tips.append("   1. Some resources take longer to create (RDS, NAT Gateway)")
-        tips.append("   2. Check if operation is still in progress")
-        tips.append("   3. Increase CloudFormation timeout if needed")
-        tips.append("   4. Check AWS service health dashboard")
-    
+    if error_type != 'permissions':
+        return list(TROUBLESHOOTING_TIPS.get(error_type, ()))
+    
+    tips = list(PERMISSION_TIPS_HEAD)
+    for error in errors[:3]:  # Show first 3 examples
+        if 'rds:' in error['reason']:
+            tips.append("      - RDS permissions (CreateDBSnapshot, DeleteDBInstance, etc.)")
+        elif 'iam:' in error['reason']:
+            tips.append("      - IAM permissions (PassRole, CreateRole, etc.)")
+        elif 'ec2:' in error['reason']:
+            tips.append("      - EC2 permissions (CreateVpc, CreateSubnet, etc.)")
+    tips.extend(PERMISSION_TIPS_TAIL)
     return tips
 
+# Events analyzed per stack
+MAX_EVENTS = 200
+
+def load_diagnose_cache(project_name, environment):
+    """Load events cached by earlier runs: {stack_name: {'since': ..., 'events': [...]}}"""
+    cache_file = Path(f'.diagnose-cache-{project_name}-{environment}.json')
+    if not cache_file.exists():
+        return {}
+    try:
+        data = cache_file.read_bytes()
+        cache = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+        for entry in cache.values():
+            for event in entry['events']:
+                event['Timestamp'] = datetime.fromisoformat(event['Timestamp'])
+        return cache
+    except Exception:
+        return {}
+
+def save_diagnose_cache(project_name, environment, cache):
+    """Rewrite the event cache atomically (temp file + rename)"""
+    cache_file = Path(f'.diagnose-cache-{project_name}-{environment}.json')
+    try:
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(cache)
+        else:
+            data = json.dumps(cache, default=str).encode('utf-8')
+        temp_file = cache_file.with_name(cache_file.name + '.tmp')
+        temp_file.write_bytes(data)
+        os.replace(temp_file, cache_file)
+    except Exception as e:
+        print(f"⚠️  Could not save diagnose cache: {e}")
+
 def load_deployment_state(project_name, environment):
     """Load deployment state from JSON file"""
     state_file = Path(f'deployment-state-{project_name}-{environment}.json')
@@ -245,142 +380,164 @@ def load_deployment_state(project_name, environment):
             return {}
     return {}
 
-def diagnose_stack(stack_name, region, verbose=False, since_timestamp=None):
-    """Diagnose a single stack"""
-    cf = boto3.client('cloudformation', region_name=region)
+def diagnose_stack(stack_name, region, verbose=False, since_timestamp=None, out=None, cached_events=None):
+    """Diagnose a single stack, writing the report to out (default: stdout)
+    
+    The report is assembled in memory and written with a single write() call.
+    cached_events are this stack's events from an earlier run (newest first);
+    only events newer than those are fetched.
+    Returns the analyzed events (newest first).
+    """
+    report = io.StringIO()
+    try:
+        return _diagnose_stack(stack_name, region, verbose, since_timestamp, report, cached_events)
+    finally:
+        (out or sys.stdout).write(report.getvalue())
+
+def _diagnose_stack(stack_name, region, verbose, since_timestamp, out, cached_events):
+    """Write the diagnosis report for a stack to out (see diagnose_stack)"""
+    cf = get_cf_client(region)
+    events = []
     
-    print(f"\n{'=' * 70}")
-    print(f"Diagnosing Stack: {stack_name}")
-    print(f"{'=' * 70}")
+    print(f"\n{BANNER}", file=out)
+    print(f"Diagnosing Stack: {stack_name}", file=out)
+    print(BANNER, file=out)
     
     # Get stack info
     try:
         stack_info = cf.describe_stacks(StackName=stack_name)['Stacks'][0]
         status = stack_info['StackStatus']
-        print(f"\n📊 Stack Status: {status}")
+        print(f"\n📊 Stack Status: {status}", file=out)
         
         if 'StackStatusReason' in stack_info:
-            print(f"   Reason: {stack_info['StackStatusReason']}")
+            print(f"   Reason: {stack_info['StackStatusReason']}", file=out)
         
         creation_time = stack_info.get('CreationTime')
         last_updated = stack_info.get('LastUpdatedTime', creation_time)
         if last_updated:
-            print(f"   Last Updated: {last_updated}")
+            print(f"   Last Updated: {last_updated}", file=out)
     except ClientError as e:
         if 'does not exist' in str(e):
-            print(f"\n⚠️  Stack does not exist")
-            return
+            print(f"\n⚠️  Stack does not exist", file=out)
+            return events
         raise
     
     # Get events
-    print(f"\n🔍 Analyzing stack events...")
+    print(f"\n🔍 Analyzing stack events...", file=out)
     if since_timestamp:
-        print(f"   Filtering events since last deployment attempt: {since_timestamp}")
-    events = get_stack_events(stack_name, region, max_events=200, since_timestamp=since_timestamp)
-    
-    if not events:
+        print(f"   Filtering events since last deployment attempt: {since_timestamp}", file=out)
+    # Cached events belong to this stack only if it was not deleted and recreated since
+    if cached_events and cached_events[0].get('StackId') != stack_info['StackId']:
+        cached_events = None
+    last_event_id = cached_events[0]['EventId'] if cached_events else None
+    event_iter = iter_stack_events(stack_name, region, max_events=MAX_EVENTS,
+                                   since_timestamp=since_timestamp, stop_at_event_id=last_event_id)
+    if cached_events:
+        event_iter = itertools.islice(itertools.chain(event_iter, cached_events), MAX_EVENTS)
+    events = list(event_iter)
+    analysis = analyze_events(events, verbose=verbose)
+    
+    if not analysis['event_count']:
         if since_timestamp:
-            print(f"   No events found since last deployment attempt")
-            print(f"   Try running without timestamp filtering or check deployment state")
+            print(f"   No events found since last deployment attempt", file=out)
+            print(f"   Try running without timestamp filtering or check deployment state", file=out)
         else:
-            print(f"   No events found")
-        return
-    
-    print(f"   Found {len(events)} events" + (" (filtered)" if since_timestamp else ""))
+            print(f"   No events found", file=out)
+        return events
     
-    # Analyze events
-    analysis = analyze_events(events)
+    print(f"   Found {analysis['event_count']} events" + (" (filtered)" if since_timestamp else ""), file=out)
     
     # Print summary
-    print(f"\n📈 Summary:")
-    print(f"   ✓ Completed resources: {len(analysis['completed_resources'])}")
-    print(f"   ⏳ In progress: {len(analysis['in_progress_resources'])}")
-    print(f"   ✗ Failed resources: {len(analysis['failed_resources'])}")
-    print(f"   ⚠️  Warnings: {len(analysis['warnings'])}")
+    print(f"\n📈 Summary:", file=out)
+    print(f"   ✓ Completed resources: {analysis['completed_count']}", file=out)
+    print(f"   ⏳ In progress: {len(analysis['in_progress_resources'])}", file=out)
+    print(f"   ✗ Failed resources: {len(analysis['failed_resources'])}", file=out)
+    print(f"   ⚠️  Warnings: {len(analysis['warnings'])}", file=out)
     
     # Show failed resources
     if analysis['failed_resources']:
-        print(f"\n{'=' * 70}")
-        print(f"❌ FAILED RESOURCES ({len(analysis['failed_resources'])})")
-        print(f"{'=' * 70}")
+        print(f"\n{BANNER}", file=out)
+        print(f"❌ FAILED RESOURCES ({len(analysis['failed_resources'])})", file=out)
+        print(BANNER, file=out)
         
         for i, failed in enumerate(analysis['failed_resources'], 1):
-            print(f"\n[{i}] {failed['resource_id']}")
-            print(f"    Type: {failed['resource_type']}")
-            print(f"    Status: {failed['status']}")
-            print(f"    Time: {failed['timestamp']}")
-            if failed['reason']:
-                print(f"    Error: {failed['reason']}")
+            print(f"\n[{i}] {failed.resource_id}", file=out)
+            print(f"    Type: {failed.resource_type}", file=out)
+            print(f"    Status: {failed.status}", file=out)
+            print(f"    Time: {failed.timestamp}", file=out)
+            if failed.reason:
+                print(f"    Error: {failed.reason}", file=out)
     
     # Show error categorization
     if analysis['errors_by_type']:
-        print(f"\n{'=' * 70}")
-        print(f"🔎 ERROR ANALYSIS")
-        print(f"{'=' * 70}")
+        print(f"\n{BANNER}", file=out)
+        print(f"🔎 ERROR ANALYSIS", file=out)
+        print(BANNER, file=out)
         
         for error_type, errors in analysis['errors_by_type'].items():
             if errors:
-                print(f"\n{error_type.upper()} Errors ({len(errors)}):")
+                print(f"\n{error_type.upper()} Errors ({len(errors)}):", file=out)
                 for error in errors[:5]:  # Show first 5
-                    print(f"   • {error['resource']}")
+                    print(f"   • {error['resource']}", file=out)
                     if verbose:
-                        print(f"     {error['reason'][:100]}")
+                        print(f"     {error['reason'][:100]}", file=out)
                 
                 # Show troubleshooting tips
                 tips = get_troubleshooting_tips(error_type, errors)
                 for tip in tips:
-                    print(f"   {tip}")
+                    print(f"   {tip}", file=out)
     
     # Show warnings
     if analysis['warnings']:
-        print(f"\n{'=' * 70}")
-        print(f"⚠️  WARNINGS ({len(analysis['warnings'])})")
-        print(f"{'=' * 70}")
+        print(f"\n{BANNER}", file=out)
+        print(f"⚠️  WARNINGS ({len(analysis['warnings'])})", file=out)
+        print(BANNER, file=out)
         
         for warning in analysis['warnings'][:10]:  # Show first 10
-            print(f"   • {warning['resource']}: {warning['status']}")
+            print(f"   • {warning['resource']}: {warning['status']}", file=out)
             if warning['reason']:
-                print(f"     {warning['reason'][:80]}")
+                print(f"     {warning['reason'][:80]}", file=out)
     
     # Show recent timeline
     if verbose and analysis['timeline']:
-        print(f"\n{'=' * 70}")
-        print(f"📅 RECENT TIMELINE (Last 20 events)")
-        print(f"{'=' * 70}")
+        print(f"\n{BANNER}", file=out)
+        print(f"📅 RECENT TIMELINE (Last {TIMELINE_LENGTH} events)", file=out)
+        print(BANNER, file=out)
         
-        for event in analysis['timeline'][:20]:
-            timestamp = event['timestamp'].strftime("%H:%M:%S") if isinstance(event['timestamp'], datetime) else str(event['timestamp'])
-            status_emoji = "✗" if "FAILED" in event['status'] else "✓" if "COMPLETE" in event['status'] else "→"
-            print(f"   {status_emoji} [{timestamp}] {event['resource']}: {event['status']}")
-            if event['reason'] and ("FAILED" in event['status'] or verbose):
-                reason_short = event['reason'][:70] + "..." if len(event['reason']) > 70 else event['reason']
-                print(f"      {reason_short}")
+        for event in analysis['timeline']:
+            timestamp = event.timestamp.strftime("%H:%M:%S") if isinstance(event.timestamp, datetime) else str(event.timestamp)
+            status_emoji = "✗" if "FAILED" in event.status else "✓" if "COMPLETE" in event.status else "→"
+            print(f"   {status_emoji} [{timestamp}] {event.resource}: {event.status}", file=out)
+            if event.reason and ("FAILED" in event.status or verbose):
+                reason_short = event.reason[:70] + "..." if len(event.reason) > 70 else event.reason
+                print(f"      {reason_short}", file=out)
     
     # Recommendations
-    print(f"\n{'=' * 70}")
-    print(f"💡 RECOMMENDATIONS")
-    print(f"{'=' * 70}")
+    print(f"\n{BANNER}", file=out)
+    print(f"💡 RECOMMENDATIONS", file=out)
+    print(BANNER, file=out)
     
     if analysis['failed_resources']:
-        print(f"\n1. Fix the issues identified above")
-        print(f"2. Retry deployment:")
-        print(f"   python deploy-stacks.py --stack <stack-name>")
-        print(f"3. For rollback issues:")
-        print(f"   python fix-rollback-failed.py {stack_name}")
+        print(f"\n1. Fix the issues identified above", file=out)
+        print(f"2. Retry deployment:", file=out)
+        print(f"   python deploy-stacks.py --stack <stack-name>", file=out)
+        print(f"3. For rollback issues:", file=out)
+        print(f"   python fix-rollback-failed.py {stack_name}", file=out)
     elif status.endswith('_IN_PROGRESS'):
-        print(f"\n1. Stack is still in progress")
-        print(f"2. Monitor with:")
-        print(f"   python check-stacks-status.py --watch")
+        print(f"\n1. Stack is still in progress", file=out)
+        print(f"2. Monitor with:", file=out)
+        print(f"   python check-stacks-status.py --watch", file=out)
     elif status.endswith('_COMPLETE'):
-        print(f"\n✓ Stack is in a completed state")
+        print(f"\n✓ Stack is in a completed state", file=out)
         if 'ROLLBACK' in status:
-            print(f"   Note: Stack rolled back but is stable")
+            print(f"   Note: Stack rolled back but is stable", file=out)
     else:
-        print(f"\n1. Check AWS Console for detailed error messages")
-        print(f"2. Review CloudWatch Logs if applicable")
-        print(f"3. Verify all prerequisites are met")
+        print(f"\n1. Check AWS Console for detailed error messages", file=out)
+        print(f"2. Review CloudWatch Logs if applicable", file=out)
+        print(f"3. Verify all prerequisites are met", file=out)
     
-    print(f"\n{'=' * 70}")
+    print(f"\n{BANNER}", file=out)
+    return events
 
 def main():
     """Main function"""
@@ -430,9 +587,9 @@ Examples:
     environment = args.env
     region = args.region
     
-    print("=" * 70)
+    print(BANNER)
     print("CloudFormation Stack Diagnostics")
-    print("=" * 70)
+    print(BANNER)
     print(f"\nProject: {project_name}")
     print(f"Environment: {environment}")
     print(f"Region: {region}")
@@ -464,7 +621,7 @@ Examples:
         # Check if it's failed if --failed-only is set
         if args.failed_only:
             try:
-                cf = boto3.client('cloudformation', region_name=region)
+                cf = get_cf_client(region)
                 stack_info = cf.describe_stacks(StackName=args.stack_name)['Stacks'][0]
                 if not is_failed_stack(args.stack_name, stack_info['StackStatus']):
                     print(f"\n⚠️  Stack {args.stack_name} is not in a failed state")
@@ -484,7 +641,7 @@ Examples:
         # Check if it's failed if --failed-only is set
         if args.failed_only:
             try:
-                cf = boto3.client('cloudformation', region_name=region)
+                cf = get_cf_client(region)
                 stack_info = cf.describe_stacks(StackName=stack_name)['Stacks'][0]
                 if not is_failed_stack(stack_name, stack_info['StackStatus']):
                     print(f"\n⚠️  Stack {stack_name} is not in a failed state")
@@ -500,15 +657,18 @@ Examples:
             stacks_to_diagnose = [{'StackName': stack_name}]
     else:
         # Get all stacks
-        all_stacks = get_all_stacks(project_name, environment, region)
+        all_stacks = get_all_stacks(project_name, environment, region, failed_only=args.failed_only)
         
         if args.failed_only:
-            # Only diagnose stacks that are marked as failed
-            stacks_to_diagnose = []
-            for s in all_stacks:
-                stack_name = s['StackName']
-                if is_failed_stack(stack_name, s.get('StackStatus')):
-                    stacks_to_diagnose.append(s)
+            # Only diagnose stacks that are marked as failed - AWS already filtered
+            # by status, so add stacks only the deployment state marks as failed
+            stacks_to_diagnose = list(all_stacks)
+            listed = {s['StackName'] for s in all_stacks}
+            stack_prefix = f"{project_name}-{environment}-"
+            for stack_name in deployment_state.get('stacks', {}):
+                if (stack_name not in listed and stack_name.startswith(stack_prefix)
+                        and is_failed_stack(stack_name)):
+                    stacks_to_diagnose.append({'StackName': stack_name})
             
             if not stacks_to_diagnose:
                 print(f"\n✓ No failed stacks found")
@@ -520,7 +680,9 @@ Examples:
         print(f"\n⚠️  No stacks found")
         return
     
-    # Diagnose each stack
+    # Diagnose stacks concurrently, each into its own buffer, and print the
+    # reports in order as they complete
+    jobs = []
     for stack in stacks_to_diagnose:
         # Extract stack name (handles both dict formats)
         stack_name = stack.get('StackName') if isinstance(stack, dict) else str(stack)
@@ -534,19 +696,42 @@ Examples:
             stack_state = deployment_state['stacks'][stack_name]
             since_timestamp = stack_state.get('last_attempt_timestamp')
         
-        diagnose_stack(stack_name, region, verbose=args.verbose, since_timestamp=since_timestamp)
-        
-        # Export if requested
-        if args.export:
-            events = get_stack_events(stack_name, region)
-            export_file = f"diagnostics-{stack_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
-            with open(export_file, 'w') as f:
-                json.dump({
+        jobs.append((stack_name, since_timestamp))
+    
+    # Events seen by earlier runs - only newer events are fetched for these
+    event_cache = load_diagnose_cache(project_name, environment)
+    
+    def run_diagnosis(job):
+        stack_name, since_timestamp = job
+        cached = event_cache.get(stack_name)
+        cached_events = cached['events'] if cached and cached.get('since') == since_timestamp else None
+        report = io.StringIO()
+        events = diagnose_stack(stack_name, region, verbose=args.verbose, since_timestamp=since_timestamp,
+                                out=report, cached_events=cached_events)
+        return report.getvalue(), events
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_DIAGNOSE_WORKERS, len(jobs)))) as executor:
+        for (stack_name, since_timestamp), (report, events) in zip(jobs, executor.map(run_diagnosis, jobs)):
+            sys.stdout.write(report)
+            if events:
+                event_cache[stack_name] = {'since': since_timestamp, 'events': events}
+            
+            # Export if requested (the events diagnose_stack already fetched)
+            if args.export:
+                export_file = f"diagnostics-{stack_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+                payload = {
                     'stack_name': stack_name,
                     'timestamp': datetime.now().isoformat(),
                     'events': events
-                }, f, indent=2, default=str)
-            print(f"\n📄 Events exported to: {export_file}")
+                }
+                if ORJSON_AVAILABLE:
+                    data = orjson.dumps(payload, option=orjson.OPT_INDENT_2)
+                else:
+                    data = json.dumps(payload, indent=2, default=str).encode('utf-8')
+                Path(export_file).write_bytes(data)
+                print(f"\n📄 Events exported to: {export_file}")
+    
+    save_diagnose_cache(project_name, environment, event_cache)
 
 if __name__ == '__main__':
     try:
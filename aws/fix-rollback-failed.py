@@ -6,9 +6,26 @@ Handles stuck rollback operations by continuing rollback or skipping resources
 import boto3
 import sys
 import time
+import random
 import argparse
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+# Adaptive retries back off client-side instead of failing on Throttling errors
+BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    connect_timeout=5,
+    read_timeout=30
+)
+
+THROTTLING_ERROR_CODES = ('Throttling', 'ThrottlingException', 'RequestLimitExceeded')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# How long a stack may sit in its old status before that status is taken as the outcome
+# (an operation can fail straight back into the state it started from between polls)
+OPERATION_START_GRACE_SECONDS = 120
+
 def get_stack_status(cf_client, stack_name):
     """Get current stack status"""
     try:
@@ -19,16 +36,15 @@ def get_stack_status(cf_client, stack_name):
         return None
 
 def get_stack_events(cf_client, stack_name, limit=10):
-    """Get recent stack events to see what failed"""
+    """Yield the most recent stack events (newest first) to see what failed"""
+    # DescribeStackEvents has no page-size parameter, so cap the total with
+    # MaxItems and let the paginator stop once `limit` events have been seen
+    paginator = cf_client.get_paginator('describe_stack_events')
+    pages = paginator.paginate(StackName=stack_name, PaginationConfig={'MaxItems': limit})
     try:
-        response = cf_client.describe_stack_events(
-            StackName=stack_name,
-            MaxResults=limit
-        )
-        return response['StackEvents']
+        yield from pages.search('StackEvents[]')
     except ClientError as e:
         print(f"Error getting stack events: {e}")
-        return []
 
 def continue_rollback(cf_client, stack_name, resources_to_skip=None):
     """Continue rollback operation"""
@@ -51,74 +67,106 @@ def continue_rollback(cf_client, stack_name, resources_to_skip=None):
             print(f"✗ Error continuing rollback: {e}")
             return False
 
-def delete_stack_force(cf_client, stack_name):
+def delete_stack_force(cf_client, stack_name, resources_to_skip):
     """Force delete stack by skipping resources"""
     print(f"\n⚠ WARNING: This will force delete the stack!")
     print(f"   Resources that can't be deleted will be skipped.")
     
+    # The caller chose force-delete because a resource is blocking, so skip it
+    # straight away instead of first retrying the rollback as-is
+    print(f"\nContinuing rollback, skipping: {', '.join(resources_to_skip)}")
+    if not continue_rollback(cf_client, stack_name, resources_to_skip=resources_to_skip):
+        return False
+    
+    # A continued rollback ends in (UPDATE_)ROLLBACK_COMPLETE - the stack still exists
+    print(f"\n⏳ Waiting for rollback to complete...")
+    status = wait_for_stack_operation(cf_client, stack_name)
+    if status is None:
+        return False
+    if not status.endswith('ROLLBACK_COMPLETE'):
+        print(f"✗ Rollback did not complete, status: {status}")
+        return False
+    print(f"✓ Rollback completed ({status})")
+    
     try:
-        # First try to continue rollback
-        print("\n1. Attempting to continue rollback...")
-        continue_rollback(cf_client, stack_name)
-        
-        # Wait a bit
-        time.sleep(10)
-        
-        # Check status
-        status = get_stack_status(cf_client, stack_name)
-        print(f"   Current status: {status}")
+        print(f"\nDeleting stack...")
+        cf_client.delete_stack(StackName=stack_name)
+        if wait_for_stack_deletion(cf_client, stack_name):
+            return True
         
-        if status == 'DELETE_IN_PROGRESS':
-            print("   Rollback continuing, waiting for completion...")
-            return wait_for_stack_deletion(cf_client, stack_name)
-        elif status == 'ROLLBACK_FAILED':
-            print("\n2. Rollback still failed. Attempting to skip Database resource...")
-            # Skip the Database resource that's blocking
-            continue_rollback(cf_client, stack_name, resources_to_skip=['Database'])
-            return wait_for_stack_deletion(cf_client, stack_name)
-        else:
-            print(f"   Unexpected status: {status}")
+        # Only a DELETE_FAILED stack accepts RetainResources - leave the blocking resources behind
+        if get_stack_status(cf_client, stack_name) != 'DELETE_FAILED':
             return False
-            
+        print(f"\nDeletion failed, retrying and retaining: {', '.join(resources_to_skip)}")
+        cf_client.delete_stack(StackName=stack_name, RetainResources=resources_to_skip)
+        return wait_for_stack_deletion(cf_client, stack_name)
     except ClientError as e:
-        print(f"✗ Error: {e}")
+        print(f"✗ Error deleting stack: {e}")
         return False
 
-def wait_for_stack_deletion(cf_client, stack_name, timeout=1800):
-    """Wait for stack deletion to complete"""
-    print(f"\n⏳ Waiting for stack deletion (timeout: {timeout}s)...")
-    start_time = time.time()
+def wait_for_stack_operation(cf_client, stack_name, timeout=1800):
+    """Poll the stack until the operation just started on it reaches a terminal state
     
-    while True:
-        try:
-            status = get_stack_status(cf_client, stack_name)
-            
-            if status is None:
-                print("✓ Stack deleted successfully")
-                return True
+    The stack is usually still in its old state (e.g. ROLLBACK_FAILED) on the first
+    polls, so a *_FAILED status only counts once the operation has visibly started
+    (or OPERATION_START_GRACE_SECONDS have passed).
+    
+    Returns the final status ('DELETE_COMPLETE' once the stack is gone), or None on
+    timeout/error.
+    """
+    start_time = time.monotonic()
+    deadline = start_time + timeout
+    initial_status = None
+    started = False
+    try:
+        while True:
+            # A randomized poll interval keeps concurrent runs from polling in lockstep
+            time.sleep(random.uniform(10, 20))
+            try:
+                status = cf_client.describe_stacks(StackName=stack_name)['Stacks'][0]['StackStatus']
+            except ClientError as e:
+                error = e.response['Error']
+                if error['Code'] in THROTTLING_ERROR_CODES and time.monotonic() < deadline:
+                    print("   Throttled by CloudFormation, backing off...")
+                    time.sleep(random.uniform(30, 60))
+                    continue
+                if 'does not exist' in error.get('Message', ''):
+                    return 'DELETE_COMPLETE'
+                raise
             
-            elapsed = int(time.time() - start_time)
+            elapsed = int(time.monotonic() - start_time)
             print(f"   [{elapsed}s] Status: {status}")
             
-            if status in ['DELETE_COMPLETE']:
-                print("✓ Stack deleted successfully")
-                return True
-            elif status in ['DELETE_FAILED', 'ROLLBACK_FAILED']:
-                print(f"✗ Stack deletion failed with status: {status}")
-                return False
+            if initial_status is None:
+                initial_status = status
+            started = (started or status.endswith('_IN_PROGRESS') or status != initial_status
+                       or elapsed >= OPERATION_START_GRACE_SECONDS)
             
-            if elapsed >= timeout:
-                print(f"✗ Timeout waiting for deletion")
-                return False
+            if status == 'DELETE_COMPLETE':
+                return status
+            if started and not status.endswith('_IN_PROGRESS') and status.endswith(('_COMPLETE', '_FAILED')):
+                return status
             
-            time.sleep(30)
-            
-        except KeyboardInterrupt:
-            print("\n⚠ Interrupted by user")
-            return False
-        except Exception as e:
-            print(f"✗ Error: {e}")
-            return False
+            if time.monotonic() >= deadline:
+                print(f"✗ Timeout waiting for stack operation (last status: {status})")
+                return None
+    except KeyboardInterrupt:
+        print("\n⚠ Interrupted by user")
+        return None
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return None
+
+def wait_for_stack_deletion(cf_client, stack_name, timeout=1800):
+    """Wait for stack deletion to complete"""
+    print(f"\n⏳ Waiting for stack deletion (timeout: {timeout}s)...")
+    status = wait_for_stack_operation(cf_client, stack_name, timeout)
+    if status == 'DELETE_COMPLETE':
+        print("✓ Stack deleted successfully")
+        return True
+    if status is not None:
+        print(f"✗ Stack deletion failed with status: {status}")
+    return False
 
 def main():
     """Main function"""
@@ -130,9 +178,12 @@ Examples:
   # Continue rollback (recommended)
   python fix-rollback-failed.py diamonddrip-production --action continue
 
-  # Force delete stack (skip blocking resources)
+  # Force delete stack (skips the Database resource by default)
   python fix-rollback-failed.py diamonddrip-production --action force-delete
 
+  # Force delete stack, skipping specific resources
+  python fix-rollback-failed.py diamonddrip-production --action force-delete --skip-resources Database DBSubnetGroup
+
   # Show detailed events and exit
   python fix-rollback-failed.py diamonddrip-production --action show-events
 
@@ -164,7 +215,7 @@ Examples:
     print(f"Region: {region}")
     print(f"Action: {args.action}\n")
     
-    cf_client = boto3.client('cloudformation', region_name=region)
+    cf_client = boto3.client('cloudformation', region_name=region, config=BOTO_CONFIG)
     
     # Check current status
     status = get_stack_status(cf_client, stack_name)
@@ -180,10 +231,11 @@ Examples:
     print("Recent stack events:")
     print("-" * 60)
     events = get_stack_events(cf_client, stack_name, limit=5)
-    for event in events[:5]:
-        print(f"  [{event['Timestamp']}] {event['ResourceStatus']}: {event['LogicalResourceId']}")
-        if event.get('ResourceStatusReason'):
-            print(f"    Reason: {event['ResourceStatusReason']}")
+    for event in events:
+        print(f"  [{event['Timestamp'].strftime(TIMESTAMP_FORMAT)}] {event['ResourceStatus']}: {event['LogicalResourceId']}")
+        reason = event.get('ResourceStatusReason')
+        if reason:
+            print(f"    Reason: {reason}")
     print()
     
     # Execute action
@@ -205,16 +257,17 @@ Examples:
                 print(f"\nStatus changed to: {status}")
     
     elif args.action == 'force-delete':
-        delete_stack_force(cf_client, stack_name)
+        delete_stack_force(cf_client, stack_name, args.skip_resources or ['Database'])
     
     elif args.action == 'show-events':
         print("Detailed stack events:")
         print("-" * 60)
         events = get_stack_events(cf_client, stack_name, limit=20)
         for event in events:
-            print(f"\n[{event['Timestamp']}] {event['ResourceStatus']}: {event['LogicalResourceId']}")
-            if event.get('ResourceStatusReason'):
-                print(f"  Reason: {event['ResourceStatusReason']}")
+            print(f"\n[{event['Timestamp'].strftime(TIMESTAMP_FORMAT)}] {event['ResourceStatus']}: {event['LogicalResourceId']}")
+            reason = event.get('ResourceStatusReason')
+            if reason:
+                print(f"  Reason: {reason}")
 
 if __name__ == '__main__':
     main()
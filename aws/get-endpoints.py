@@ -8,34 +8,35 @@ import sys
 import boto3
 import argparse
 from pathlib import Path
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 
-def get_stack_outputs(stack_name, region):
-    """Get outputs from a CloudFormation stack"""
-    cf = boto3.client('cloudformation', region_name=region)
-    try:
-        response = cf.describe_stacks(StackName=stack_name)
-        outputs = {}
-        for output in response['Stacks'][0].get('Outputs', []):
-            outputs[output['OutputKey']] = output['OutputValue']
-        return outputs
-    except ClientError as e:
-        error_code = e.response.get('Error', {}).get('Code', '')
-        if error_code == 'ValidationError' and 'does not exist' in str(e):
-            return None
-        raise
+# orjson is optional - faster --json output when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Adaptive retries back off client-side when the parallel lookups get throttled
+BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    connect_timeout=5,
+    read_timeout=30
+)
 
-def get_stack_status(stack_name, region):
-    """Get status of a CloudFormation stack"""
-    cf = boto3.client('cloudformation', region_name=region)
+def describe_stack(cf, stack_name):
+    """Get (status, outputs) for a stack from one DescribeStacks call; (None, None) if it doesn't exist"""
     try:
-        response = cf.describe_stacks(StackName=stack_name)
-        return response['Stacks'][0]['StackStatus']
+        stack = cf.describe_stacks(StackName=stack_name)['Stacks'][0]
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code', '')
         if error_code == 'ValidationError' and 'does not exist' in str(e):
-            return None
+            return None, None
         raise
+    outputs = {o['OutputKey']: o['OutputValue'] for o in stack.get('Outputs', [])}
+    return stack['StackStatus'], outputs
 
 def format_url(url):
     """Format URL for display"""
@@ -43,6 +44,131 @@ def format_url(url):
         return f"https://{url}"
     return url
 
+DIAGNOSTIC_PAGES = [
+    'diagnostic.html',
+    'beacon.html',
+    'detectorTest.html',
+    'predictionCallDiagnostic.html',
+    'backend-diagnostic.html',
+    'prediction-visualizer.html',
+    'simpleDetectorTest.html',
+    'legacyDetectorTest.html',
+    'microphoneInfo.html'
+]
+
+def render_bucket_and_distribution(bucket_name, dist_id):
+    """Render the S3 bucket / CloudFront distribution lines shared by frontend stacks"""
+    lines = []
+    if bucket_name:
+        lines += ["\n  🪣 S3 Bucket:", f"     {bucket_name}"]
+    if dist_id:
+        lines += ["\n  ☁️  CloudFront Distribution ID:", f"     {dist_id}"]
+    return lines
+
+def render_application(outputs):
+    """Render API endpoint and Lambda function info"""
+    api_endpoint = outputs.get('ApiEndpoint')
+    lambda_name = outputs.get('LambdaFunctionName')
+    lines = []
+    if api_endpoint:
+        lines += [
+            "\n  🌐 API Endpoint:",
+            f"     {api_endpoint}",
+            "\n  📋 Available Routes:",
+            f"     POST   {api_endpoint}/prediction",
+            f"     GET    {api_endpoint}/stats",
+            f"     GET    {api_endpoint}/recent?limit=100",
+            f"     GET    {api_endpoint}/health",
+            f"     GET    {api_endpoint}/"
+        ]
+    if lambda_name:
+        lines += ["\n  ⚡ Lambda Function:", f"     {lambda_name}"]
+    return lines
+
+def render_frontend(outputs):
+    """Render player client URL, bucket and distribution"""
+    player_url = outputs.get('PlayerClientURL')
+    lines = []
+    if player_url:
+        full_url = format_url(player_url)
+        lines += [
+            "\n  🌐 Frontend URL:",
+            f"     {full_url}",
+            "\n  📊 Database Viewer:",
+            f"     {full_url}/viewer.html"
+        ]
+    return lines + render_bucket_and_distribution(
+        outputs.get('PlayerClientBucketName'), outputs.get('PlayerClientDistributionId'))
+
+def render_diagnostics_frontend(outputs):
+    """Render diagnostics client URL, pages, bucket and distribution"""
+    diagnostics_url = outputs.get('DiagnosticsClientURL')
+    lines = []
+    if diagnostics_url:
+        full_url = format_url(diagnostics_url)
+        lines += ["\n  🔬 Diagnostics URL:", f"     {full_url}", "\n  📋 Available Diagnostic Pages:"]
+        lines += [f"     {full_url}/{page}" for page in DIAGNOSTIC_PAGES]
+    return lines + render_bucket_and_distribution(
+        outputs.get('DiagnosticsClientBucketName'), outputs.get('DiagnosticsClientDistributionId'))
+
+def render_database(outputs):
+    """Render database connection info"""
+    db_endpoint = outputs.get('DatabaseEndpoint')
+    db_port = outputs.get('DatabasePort')
+    lines = []
+    if db_endpoint:
+        lines += ["\n  🗄️  Database Endpoint:", f"     {db_endpoint}"]
+    if db_port:
+        lines += ["\n  🔌 Database Port:", f"     {db_port}"]
+    if db_endpoint and db_port:
+        lines += [
+            "\n  📝 Connection String:",
+            f"     Host: {db_endpoint}",
+            f"     Port: {db_port}",
+            "     Database: diamonddrip"
+        ]
+    return lines
+
+def render_network(outputs):
+    """Render VPC info"""
+    vpc_id = outputs.get('VPCId')
+    if vpc_id:
+        return ["\n  🌐 VPC ID:", f"     {vpc_id}"]
+    return []
+
+RENDERERS = {
+    'application': render_application,
+    'frontend': render_frontend,
+    'diagnostics-frontend': render_diagnostics_frontend,
+    'database': render_database,
+    'network': render_network
+}
+
+def render_stack(stack_key, stack_info, status, outputs):
+    """Render one stack's section of the report as a single string"""
+    stack_name = stack_info['name']
+    if status is None:
+        lines = [f"\n❌ {stack_info['display']}: {stack_name}", "   Status: Stack does not exist"]
+    else:
+        lines = [
+            f"\n{'=' * 70}",
+            f"{stack_info['display']}: {stack_name}",
+            f"{'=' * 70}",
+            f"Status: {status}"
+        ]
+        if outputs:
+            lines.append("\n📡 Endpoints & Information:")
+            lines += RENDERERS[stack_key](outputs)
+            
+            # Show any outputs the stack-specific renderer doesn't cover
+            other_outputs = {k: v for k, v in outputs.items() if k not in stack_info['outputs']}
+            if other_outputs:
+                lines.append("\n  📦 Other Outputs:")
+                lines += [f"     {key}: {value}" for key, value in other_outputs.items()]
+        else:
+            lines.append("\n⚠️  No outputs available (stack may still be deploying)")
+    return ''.join(f"{line}\n" for line in lines)
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(
@@ -117,182 +243,58 @@ Examples:
             'stacks': {}
         }
     else:
-        print("=" * 70)
-        print("DiamondDrip Stack Endpoints")
-        print("=" * 70)
-        print(f"\nProject: {project_name}")
-        print(f"Environment: {environment}")
-        print(f"Region: {region}")
-        print("\n" + "=" * 70)
+        sys.stdout.write(
+            f"{'=' * 70}\n"
+            "DiamondDrip Stack Endpoints\n"
+            f"{'=' * 70}\n"
+            f"\nProject: {project_name}\n"
+            f"Environment: {environment}\n"
+            f"Region: {region}\n"
+            f"\n{'=' * 70}\n"
+        )
+        sys.stdout.flush()
     
-    found_any = False
+    # Look up every stack in parallel; clients are thread-safe, so build one
+    # from a dedicated session up front rather than the lazily created default
+    session = boto3.session.Session(region_name=region)
+    cf = session.client('cloudformation', config=BOTO_CONFIG)
+    with ThreadPoolExecutor(max_workers=len(stacks)) as executor:
+        results = list(executor.map(lambda info: describe_stack(cf, info['name']), stacks.values()))
     
-    for stack_key, stack_info in stacks.items():
-        stack_name = stack_info['name']
-        status = get_stack_status(stack_name, region)
-        
-        if status is None:
-            if not args.json:
-                print(f"\n❌ {stack_info['display']}: {stack_name}")
-                print(f"   Status: Stack does not exist")
-            else:
-                result['stacks'][stack_key] = {
-                    'name': stack_name,
-                    'status': 'DOES_NOT_EXIST',
-                    'outputs': {}
-                }
-            continue
-        
-        outputs = get_stack_outputs(stack_name, region)
-        
-        if not args.json:
-            print(f"\n{'=' * 70}")
-            print(f"{stack_info['display']}: {stack_name}")
-            print(f"{'=' * 70}")
-            print(f"Status: {status}")
-            
-            if outputs:
-                found_any = True
-                print(f"\n📡 Endpoints & Information:")
-                
-                # Application stack - show API endpoints
-                if stack_key == 'application':
-                    api_endpoint = outputs.get('ApiEndpoint')
-                    lambda_name = outputs.get('LambdaFunctionName')
-                    
-                    if api_endpoint:
-                        print(f"\n  🌐 API Endpoint:")
-                        print(f"     {api_endpoint}")
-                        print(f"\n  📋 Available Routes:")
-                        print(f"     POST   {api_endpoint}/prediction")
-                        print(f"     GET    {api_endpoint}/stats")
-                        print(f"     GET    {api_endpoint}/recent?limit=100")
-                        print(f"     GET    {api_endpoint}/health")
-                        print(f"     GET    {api_endpoint}/")
-                    
-                    if lambda_name:
-                        print(f"\n  ⚡ Lambda Function:")
-                        print(f"     {lambda_name}")
-                
-                # Frontend stack - show CloudFront URL
-                elif stack_key == 'frontend':
-                    player_url = outputs.get('PlayerClientURL')
-                    bucket_name = outputs.get('PlayerClientBucketName')
-                    dist_id = outputs.get('PlayerClientDistributionId')
-                    
-                    if player_url:
-                        full_url = format_url(player_url)
-                        print(f"\n  🌐 Frontend URL:")
-                        print(f"     {full_url}")
-                        print(f"\n  📊 Database Viewer:")
-                        print(f"     {full_url}/viewer.html")
-                    
-                    if bucket_name:
-                        print(f"\n  🪣 S3 Bucket:")
-                        print(f"     {bucket_name}")
-                    
-                    if dist_id:
-                        print(f"\n  ☁️  CloudFront Distribution ID:")
-                        print(f"     {dist_id}")
-                
-                # Diagnostics Frontend stack - show CloudFront URL
-                elif stack_key == 'diagnostics-frontend':
-                    diagnostics_url = outputs.get('DiagnosticsClientURL')
-                    bucket_name = outputs.get('DiagnosticsClientBucketName')
-                    dist_id = outputs.get('DiagnosticsClientDistributionId')
-                    
-                    if diagnostics_url:
-                        full_url = format_url(diagnostics_url)
-                        print(f"\n  🔬 Diagnostics URL:")
-                        print(f"     {full_url}")
-                    print(f"\n  📋 Available Diagnostic Pages:")
-                    print(f"     {full_url}/diagnostic.html")
-                    print(f"     {full_url}/beacon.html")
-                    print(f"     {full_url}/detectorTest.html")
-                    print(f"     {full_url}/predictionCallDiagnostic.html")
-                    print(f"     {full_url}/backend-diagnostic.html")
-                    print(f"     {full_url}/prediction-visualizer.html")
-                    print(f"     {full_url}/simpleDetectorTest.html")
-                    print(f"     {full_url}/legacyDetectorTest.html")
-                    print(f"     {full_url}/microphoneInfo.html")
-                    
-                    if bucket_name:
-                        print(f"\n  🪣 S3 Bucket:")
-                        print(f"     {bucket_name}")
-                    
-                    if dist_id:
-                        print(f"\n  ☁️  CloudFront Distribution ID:")
-                        print(f"     {dist_id}")
-                
-                # Database stack - show connection info
-                elif stack_key == 'database':
-                    db_endpoint = outputs.get('DatabaseEndpoint')
-                    db_port = outputs.get('DatabasePort')
-                    
-                    if db_endpoint:
-                        print(f"\n  🗄️  Database Endpoint:")
-                        print(f"     {db_endpoint}")
-                    
-                    if db_port:
-                        print(f"\n  🔌 Database Port:")
-                        print(f"     {db_port}")
-                    
-                    if db_endpoint and db_port:
-                        print(f"\n  📝 Connection String:")
-                        print(f"     Host: {db_endpoint}")
-                        print(f"     Port: {db_port}")
-                        print(f"     Database: diamonddrip")
-                
-                # Network stack - show VPC info
-                elif stack_key == 'network':
-                    vpc_id = outputs.get('VPCId')
-                    
-                    if vpc_id:
-                        print(f"\n  🌐 VPC ID:")
-                        print(f"     {vpc_id}")
-                
-                # Show any other outputs
-                shown_keys = {
-                    'application': ['ApiEndpoint', 'LambdaFunctionName'],
-                    'frontend': ['PlayerClientURL', 'PlayerClientBucketName', 'PlayerClientDistributionId'],
-                    'diagnostics-frontend': ['DiagnosticsClientURL', 'DiagnosticsClientBucketName', 'DiagnosticsClientDistributionId'],
-                    'database': ['DatabaseEndpoint', 'DatabasePort'],
-                    'network': ['VPCId']
-                }
-                
-                other_outputs = {k: v for k, v in outputs.items() 
-                               if k not in shown_keys.get(stack_key, [])}
-                
-                if other_outputs:
-                    print(f"\n  📦 Other Outputs:")
-                    for key, value in other_outputs.items():
-                        print(f"     {key}: {value}")
-            else:
-                print(f"\n⚠️  No outputs available (stack may still be deploying)")
-        else:
-            # JSON output
+    found_any = any(outputs for _, outputs in results)
+    
+    if args.json:
+        for (stack_key, stack_info), (status, outputs) in zip(stacks.items(), results):
             result['stacks'][stack_key] = {
-                'name': stack_name,
-                'status': status,
+                'name': stack_info['name'],
+                'status': status or 'DOES_NOT_EXIST',
                 'outputs': outputs or {}
             }
-            if outputs:
-                found_any = True
+        if ORJSON_AVAILABLE:
+            print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+        else:
+            print(json.dumps(result, indent=2))
+        return
     
-    if args.json:
-        print(json.dumps(result, indent=2))
+    # Build the whole report and write it in one go
+    sections = [render_stack(stack_key, stack_info, status, outputs)
+                for (stack_key, stack_info), (status, outputs) in zip(stacks.items(), results)]
+    sections.append("\n" + "=" * 70 + "\n")
+    if found_any:
+        sections.append(
+            "\n💡 Tips:\n"
+            "   - Use these endpoints in your client configuration\n"
+            "   - API endpoints support CORS for web applications\n"
+            "   - Frontend URL may take a few minutes to become active after deployment\n"
+            "   - Database endpoint is only accessible from within the VPC\n"
+        )
     else:
-        print("\n" + "=" * 70)
-        if found_any:
-            print("\n💡 Tips:")
-            print("   - Use these endpoints in your client configuration")
-            print("   - API endpoints support CORS for web applications")
-            print("   - Frontend URL may take a few minutes to become active after deployment")
-            print("   - Database endpoint is only accessible from within the VPC")
-        else:
-            print("\n⚠️  No stacks with outputs found")
-            print("   Make sure stacks are deployed and in CREATE_COMPLETE or UPDATE_COMPLETE state")
-        print("=" * 70)
+        sections.append(
+            "\n⚠️  No stacks with outputs found\n"
+            "   Make sure stacks are deployed and in CREATE_COMPLETE or UPDATE_COMPLETE state\n"
+        )
+    sections.append("=" * 70 + "\n")
+    sys.stdout.write(''.join(sections))
 
 if __name__ == '__main__':
     # Change to aws directory
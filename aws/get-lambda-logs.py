@@ -6,25 +6,56 @@ Supports tailing, filtering, and time-based queries
 import boto3
 import argparse
 import sys
-from datetime import datetime, timedelta
+import time
+import calendar
 from pathlib import Path
 import os
+from botocore.config import Config
+from botocore.exceptions import EventStreamError
+from concurrent.futures import ThreadPoolExecutor
+
+# Adaptive retries back off client-side instead of failing on Throttling errors.
+# Live Tail sends a session update every second, so the read timeout also
+# holds for a quiet --follow stream.
+BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    connect_timeout=5,
+    read_timeout=30
+)
+
+_session = None
+
+def get_session():
+    """Get the shared boto3 session, creating it on first use"""
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+_clients = {}
+
+def get_client(service_name, region):
+    """Get a client from the shared session, reusing it across calls"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = get_session().client(service_name, region_name=region, config=BOTO_CONFIG)
+    return _clients[key]
 
 def get_lambda_function_name(stack_name, region='us-east-1'):
     """Get Lambda function name from CloudFormation stack outputs"""
-    cf = boto3.client('cloudformation', region_name=region)
+    cf = get_client('cloudformation', region)
     try:
         response = cf.describe_stacks(StackName=stack_name)
-        outputs = {o['OutputKey']: o['OutputValue'] 
-                  for o in response['Stacks'][0].get('Outputs', [])}
-        function_name = outputs.get('LambdaFunctionName')
-        if not function_name:
-            # Try to get it from the stack resources
-            resources = cf.describe_stack_resources(StackName=stack_name)
-            for resource in resources.get('StackResources', []):
-                if resource['ResourceType'] == 'AWS::Lambda::Function':
-                    return resource['PhysicalResourceId']
-        return function_name
+        for output in response['Stacks'][0].get('Outputs', []):
+            if output['OutputKey'] == 'LambdaFunctionName' and output['OutputValue']:
+                return output['OutputValue']
+        
+        # Not exported as an output - find it in the stack resources
+        resources = cf.describe_stack_resources(StackName=stack_name)
+        for resource in resources.get('StackResources', []):
+            if resource['ResourceType'] == 'AWS::Lambda::Function':
+                return resource['PhysicalResourceId']
+        return None
     except Exception as e:
         print(f"[ERROR] Could not get Lambda function name from stack: {e}")
         return None
@@ -33,78 +64,172 @@ def get_log_group_name(function_name):
     """Get CloudWatch Log Group name for Lambda function"""
     return f"/aws/lambda/{function_name}"
 
-def get_logs(log_group_name, region='us-east-1', start_time=None, end_time=None, 
-             filter_pattern=None, limit=100, follow=False):
-    """Get logs from CloudWatch Logs"""
-    logs = boto3.client('logs', region_name=region)
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_utc_time(value):
+    """Parse a 'YYYY-MM-DD HH:MM:SS' UTC time into epoch milliseconds"""
+    return calendar.timegm(time.strptime(value, TIME_FORMAT)) * 1000
+
+def format_utc_time(ms):
+    """Format epoch milliseconds as a 'YYYY-MM-DD HH:MM:SS' UTC time"""
+    return time.strftime(TIME_FORMAT, time.gmtime(ms // 1000))
+
+# Events arrive in bursts that share a second, so the formatted timestamp
+# of the previous event is usually reusable
+_last_second = None
+_last_second_str = ''
+
+def format_log_event(event):
+    """Format a log event as '[YYYY-MM-DD HH:MM:SS] message' (UTC)"""
+    global _last_second, _last_second_str
+    second = event['timestamp'] // 1000
+    if second != _last_second:
+        _last_second = second
+        _last_second_str = time.strftime(TIME_FORMAT, time.gmtime(second))
+    return f"[{_last_second_str}] {event['message'].rstrip()}"
+
+# Large dumps are written in batches rather than one print() per event
+OUTPUT_BATCH_SIZE = 500
+
+def write_lines(lines):
+    """Write formatted log lines to stdout in a single call"""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+
+_account_id = None
+
+def get_log_group_arn(log_group_name, region):
+    """Get the ARN of a log group, looking up the account ID once"""
+    global _account_id
+    if _account_id is None:
+        _account_id = get_client('sts', region).get_caller_identity()['Account']
+    return f"arn:aws:logs:{region}:{_account_id}:log-group:{log_group_name}"
+
+# Upper bound on events backfilled between the history fetch and a Live Tail session start
+BACKFILL_LIMIT = 10000
+
+def _event_key(event):
+    """Identify a log event across filter_log_events and Live Tail results"""
+    return (event.get('logStreamName'), event.get('timestamp'), event.get('message'))
+
+def tail_logs(logs, log_group_name, region, filter_pattern=None, since_ms=None, seen=None):
+    """Stream new log events as they arrive using CloudWatch Logs Live Tail
+    
+    Live Tail only delivers events ingested after its session starts, so events
+    from since_ms up to each session start are backfilled with filter_log_events.
+    seen holds keys of events already printed at since_ms, which are skipped.
+    """
+    kwargs = {'logGroupIdentifiers': [get_log_group_arn(log_group_name, region)]}
+    if filter_pattern:
+        kwargs['logEventFilterPattern'] = filter_pattern
     
-    # Check if log group exists
+    printed_count = 0
+    backfilled = set(seen or ())
     try:
-        logs.describe_log_groups(logGroupNamePrefix=log_group_name)
-    except Exception as e:
-        print(f"[ERROR] Could not access log group {log_group_name}: {e}")
-        return False
+        while True:
+            stream = logs.start_live_tail(**kwargs)['responseStream']
+            try:
+                for stream_event in stream:
+                    if 'sessionStart' in stream_event:
+                        session_start_ms = time.time_ns() // 1_000_000
+                        if since_ms is not None:
+                            events = list(fetch_log_events(logs, log_group_name, since_ms + 1, session_start_ms,
+                                                           filter_pattern, BACKFILL_LIMIT))
+                            if len(events) >= BACKFILL_LIMIT:
+                                print(f"[WARNING] Backfill stopped at {BACKFILL_LIMIT} events - "
+                                      f"events after {format_utc_time(events[-1]['timestamp'])} UTC were skipped")
+                            events = [event for event in events if _event_key(event) not in backfilled]
+                            write_lines([format_log_event(event) for event in events])
+                            printed_count += len(events)
+                            # Late-ingested events can show up in both - print them once
+                            backfilled = {_event_key(event) for event in events}
+                        since_ms = session_start_ms
+                        continue
+                    results = stream_event.get('sessionUpdate', {}).get('sessionResults', [])
+                    if backfilled:
+                        results = [event for event in results if _event_key(event) not in backfilled]
+                    write_lines([format_log_event(event) for event in results])
+                    sys.stdout.flush()
+                    printed_count += len(results)
+            except EventStreamError as e:
+                # Errors inside the stream arrive as EventStreamError, not the modeled exception
+                if e.response['Error']['Code'] != 'SessionTimeoutException':
+                    raise
+                # Live Tail sessions end after 3 hours - start a new one, backfilling the gap
+                since_ms = time.time_ns() // 1_000_000
+            finally:
+                stream.close()
+    except KeyboardInterrupt:
+        pass
+    return printed_count
+
+def fetch_log_events(logs, log_group_name, start_ms, end_ms, filter_pattern=None, limit=100):
+    """Iterate log events in a time range, following pagination up to `limit` events"""
+    kwargs = {
+        'logGroupName': log_group_name,
+        'startTime': start_ms,
+        'endTime': end_ms,
+        # Pages can come back empty before the range is exhausted, so let
+        # the paginator follow nextToken until `limit` events are seen
+        'PaginationConfig': {'MaxItems': limit, 'PageSize': min(limit, 10000)}
+    }
+    if filter_pattern:
+        kwargs['filterPattern'] = filter_pattern
+    return logs.get_paginator('filter_log_events').paginate(**kwargs).search('events[]')
+
+def get_logs(log_group_name, region='us-east-1', start_ms=None, end_ms=None, 
+             filter_pattern=None, limit=100, follow=False, prefetched=None):
+    """Get logs from CloudWatch Logs (prefetched: optional future holding the events)"""
+    logs = get_client('logs', region)
     
     # Set default time range (last hour if not specified)
-    if start_time is None:
-        start_time = datetime.utcnow() - timedelta(hours=1)
-    if end_time is None:
-        end_time = datetime.utcnow()
-    
-    start_timestamp = int(start_time.timestamp() * 1000)
-    end_timestamp = int(end_time.timestamp() * 1000)
+    if end_ms is None:
+        end_ms = time.time_ns() // 1_000_000
+    if start_ms is None:
+        start_ms = end_ms - 3_600_000
     
     print(f"[INFO] Fetching logs from {log_group_name}")
-    print(f"[INFO] Time range: {start_time.strftime('%Y-%m-%d %H:%M:%S')} to {end_time.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+    print(f"[INFO] Time range: {format_utc_time(start_ms)} to {format_utc_time(end_ms)} UTC")
     if filter_pattern:
         print(f"[INFO] Filter pattern: {filter_pattern}")
     print("-" * 80)
     
     try:
-        kwargs = {
-            'logGroupName': log_group_name,
-            'startTime': start_timestamp,
-            'endTime': end_timestamp,
-            'limit': limit
-        }
-        
-        if filter_pattern:
-            kwargs['filterPattern'] = filter_pattern
+        if prefetched is not None:
+            events = prefetched.result()
+        else:
+            events = fetch_log_events(logs, log_group_name, start_ms, end_ms, filter_pattern, limit)
         
-        last_seen_timestamp = start_timestamp
         printed_count = 0
-        
-        while True:
-            kwargs['startTime'] = last_seen_timestamp + 1
-            
-            response = logs.filter_log_events(**kwargs)
-            
-            events = response.get('events', [])
-            
+        batch = []
+        last_ts = None
+        last_keys = set()
+        try:
             for event in events:
-                timestamp = datetime.fromtimestamp(event['timestamp'] / 1000)
-                message = event['message'].rstrip()
-                print(f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {message}")
-                printed_count += 1
-                last_seen_timestamp = max(last_seen_timestamp, event['timestamp'])
-            
-            # If no more events and not following, break
-            if not events or not follow:
-                if not follow:
-                    break
-                # In follow mode, wait a bit before checking again
-                import time
-                time.sleep(2)
+                batch.append(format_log_event(event))
+                # Remember where history stopped so --follow can resume from there
+                if event['timestamp'] != last_ts:
+                    last_ts = event['timestamp']
+                    last_keys = set()
+                last_keys.add(_event_key(event))
+                if len(batch) >= OUTPUT_BATCH_SIZE:
+                    write_lines(batch)
+                    printed_count += len(batch)
+                    batch.clear()
+        finally:
+            # Don't lose already-fetched events if a later page fails
+            write_lines(batch)
+        printed_count += len(batch)
+        
+        if follow:
+            print("[INFO] Following new log events (Ctrl+C to stop)...")
+            if printed_count >= limit:
+                # History stopped at --limit, so resume right after the last printed event
+                # (events sharing its timestamp are deduped) instead of skipping to end_ms
+                printed_count += tail_logs(logs, log_group_name, region, filter_pattern,
+                                           since_ms=last_ts - 1, seen=last_keys)
             else:
-                # Check for more events
-                if 'nextToken' not in response:
-                    if follow:
-                        import time
-                        time.sleep(2)
-                    else:
-                        break
-                else:
-                    kwargs['nextToken'] = response['nextToken']
+                printed_count += tail_logs(logs, log_group_name, region, filter_pattern, since_ms=end_ms)
         
         if printed_count == 0:
             print("[INFO] No log events found in the specified time range")
@@ -184,51 +309,71 @@ Examples:
     
     args = parser.parse_args()
     
-    # Get Lambda function name
-    if args.function_name:
-        function_name = args.function_name
-    else:
-        # Try to construct from project/env
-        if not args.stack_name or args.stack_name == 'diamonddrip-production-application':
-            args.stack_name = f'{args.project}-{args.env}-application'
-        
-        print(f"[INFO] Looking up Lambda function from stack: {args.stack_name}")
-        function_name = get_lambda_function_name(args.stack_name, args.region)
-        
-        if not function_name:
-            print(f"[ERROR] Could not determine Lambda function name")
-            print(f"[INFO] Try specifying --function-name directly")
-            sys.exit(1)
-    
-    print(f"[INFO] Lambda function: {function_name}")
-    
-    # Calculate time range
-    end_time = datetime.utcnow()
-    start_time = None
+    # Calculate time range (epoch milliseconds, UTC)
+    end_ms = time.time_ns() // 1_000_000
     
     if args.start:
         try:
-            start_time = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S')
+            start_ms = parse_utc_time(args.start)
         except ValueError:
             print(f"[ERROR] Invalid start time format. Use: YYYY-MM-DD HH:MM:SS")
             sys.exit(1)
     elif args.minutes:
-        start_time = end_time - timedelta(minutes=args.minutes)
+        start_ms = end_ms - args.minutes * 60_000
     elif args.hours:
-        start_time = end_time - timedelta(hours=args.hours)
+        start_ms = end_ms - args.hours * 3_600_000
     elif args.days:
-        start_time = end_time - timedelta(days=args.days)
+        start_ms = end_ms - args.days * 86_400_000
     else:
         # Default: last hour
-        start_time = end_time - timedelta(hours=1)
+        start_ms = end_ms - 3_600_000
     
     if args.end:
         try:
-            end_time = datetime.strptime(args.end, '%Y-%m-%d %H:%M:%S')
+            end_ms = parse_utc_time(args.end)
         except ValueError:
             print(f"[ERROR] Invalid end time format. Use: YYYY-MM-DD HH:MM:SS")
             sys.exit(1)
     
+    # Get Lambda function name
+    prefetched = None
+    if args.function_name:
+        function_name = args.function_name
+    else:
+        # Try to construct from project/env
+        if not args.stack_name or args.stack_name == 'diamonddrip-production-application':
+            args.stack_name = f'{args.project}-{args.env}-application'
+        
+        print(f"[INFO] Looking up Lambda function from stack: {args.stack_name}")
+        
+        # Create both clients up front - the shared session isn't thread-safe
+        logs = get_client('logs', args.region)
+        get_client('cloudformation', args.region)
+        
+        lookup = ThreadPoolExecutor(max_workers=2)
+        function_name_future = lookup.submit(get_lambda_function_name, args.stack_name, args.region)
+        
+        # The application stack names its function {project}-{env}-prediction-server,
+        # so fetch that function's logs while the stack lookup confirms the name
+        expected_name = f'{args.project}-{args.env}-prediction-server'
+        if args.stack_name == f'{args.project}-{args.env}-application':
+            prefetched = lookup.submit(
+                lambda: list(fetch_log_events(logs, get_log_group_name(expected_name),
+                                              start_ms, end_ms, args.filter, args.limit))
+            )
+        lookup.shutdown(wait=False)
+        
+        function_name = function_name_future.result()
+        if function_name != expected_name:
+            prefetched = None
+        
+        if not function_name:
+            print(f"[ERROR] Could not determine Lambda function name")
+            print(f"[INFO] Try specifying --function-name directly")
+            sys.exit(1)
+    
+    print(f"[INFO] Lambda function: {function_name}")
+    
     # Get log group name
     log_group_name = get_log_group_name(function_name)
     
@@ -236,11 +381,12 @@ Examples:
     success = get_logs(
         log_group_name,
         region=args.region,
-        start_time=start_time,
-        end_time=end_time,
+        start_ms=start_ms,
+        end_ms=end_ms,
         filter_pattern=args.filter,
         limit=args.limit,
-        follow=args.follow
+        follow=args.follow,
+        prefetched=prefetched
     )
     
     if not success:
@@ -4,19 +4,31 @@ Handles prediction data via API Gateway
 """
 print("[LAMBDA_INIT] Starting Lambda function module initialization...")
 import json
+import logging
 import os
+import time
 import hashlib
 import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Tuple
 print("[LAMBDA_INIT] Standard library imports complete")
 
-# Import database adapter (will be RDS PostgreSQL)
+# Root logger - the Lambda runtime attaches its CloudWatch handler here.
+# Per-request debug output is only formatted when LOG_LEVEL=DEBUG.
+logger = logging.getLogger()
 try:
-    from database import PredictionDatabase
+    logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+except ValueError:
+    logger.setLevel(logging.INFO)
+
+# orjson is optional - faster request/response (de)serialization when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    # Fallback for local testing
-    PredictionDatabase = None
+    ORJSON_AVAILABLE = False
 
 # Import prediction engine
 try:
@@ -25,55 +37,74 @@ try:
     PREDICTION_ENGINE_AVAILABLE = True
     print("Successfully imported prediction engine modules")
 except ImportError as e:
-    import traceback
-    error_msg = str(e)
-    traceback_str = traceback.format_exc()
-    print(f"ERROR: Prediction engine import failed: {error_msg}")
-    print(f"Traceback: {traceback_str}")
+    logger.exception("ERROR: Prediction engine import failed: %s", e)
     PREDICTION_ENGINE_AVAILABLE = False
     PredictionAPI = None
     PredictionMode = None
 except Exception as e:
-    import traceback
-    error_msg = str(e)
-    traceback_str = traceback.format_exc()
-    print(f"ERROR: Unexpected error importing prediction engine: {error_msg}")
-    print(f"Traceback: {traceback_str}")
+    logger.exception("ERROR: Unexpected error importing prediction engine: %s", e)
     PREDICTION_ENGINE_AVAILABLE = False
     PredictionAPI = None
     PredictionMode = None
 
-# Import boto3 for Secrets Manager (optional)
-try:
-    import boto3
-    SECRETS_MANAGER_AVAILABLE = True
-except ImportError:
-    SECRETS_MANAGER_AVAILABLE = False
-
 # Initialize database connection (reused across Lambda invocations)
 db = None
+db_lock = threading.Lock()
 
 # Initialize prediction API (reused across Lambda invocations)
 prediction_api = None
 
+# Worker threads for pulse storage (reused across Lambda invocations). Lambda freezes the
+# container once the handler returns, so requests wait for their pulse work (up to
+# PULSE_WAIT_TIMEOUT_SECONDS) rather than leaving it to a thread that may never resume.
+PULSE_WAIT_TIMEOUT_SECONDS = 5.0
+pulse_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pulse')
+
+# Secrets Manager client and fetched credentials (reused across Lambda invocations).
+# Credentials are refetched after the TTL so a rotated secret is picked up on reconnect.
+# boto3 is imported on first use - it is slow to import and only needed when DB_SECRET_ARN is set.
+SECRET_CACHE_TTL_SECONDS = 600
+secrets_client = None
+secret_cache = {}  # secret_arn -> (credentials, fetched_at)
+
 def get_secrets_manager_credentials(secret_arn: str) -> Optional[Dict[str, str]]:
-    """Get database credentials from AWS Secrets Manager"""
-    if not SECRETS_MANAGER_AVAILABLE:
-        print("Warning: boto3 not available, cannot use Secrets Manager")
-        return None
+    """Get database credentials from AWS Secrets Manager (cached for SECRET_CACHE_TTL_SECONDS)"""
+    global secrets_client
+    cached = secret_cache.get(secret_arn)
+    if cached and time.monotonic() - cached[1] < SECRET_CACHE_TTL_SECONDS:
+        return cached[0]
     
     try:
-        secrets_client = boto3.client('secretsmanager')
+        if secrets_client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except ImportError:
+                print("Warning: boto3 not available, cannot use Secrets Manager")
+                return None
+            # Standard retry mode backs off exponentially with jitter on throttling/transient errors;
+            # short timeouts keep a slow endpoint from eating the invocation
+            secrets_client = boto3.client('secretsmanager', config=Config(
+                retries={'mode': 'standard', 'max_attempts': 3},
+                connect_timeout=2,
+                read_timeout=5
+            ))
         response = secrets_client.get_secret_value(SecretId=secret_arn)
         secret_string = response['SecretString']
         secret_data = json.loads(secret_string)
-        return {
+        credentials = {
             'user': secret_data.get('username'),
             'password': secret_data.get('password'),
             'database': secret_data.get('database', 'diamonddrip')
         }
+        secret_cache[secret_arn] = (credentials, time.monotonic())
+        return credentials
     except Exception as e:
         print(f"Warning: Failed to retrieve credentials from Secrets Manager: {e}")
+        if cached:
+            # Stale credentials beat none - if they were rotated, the connect fails and is retried later
+            print("Using previously fetched Secrets Manager credentials")
+            return cached[0]
         return None
 
 def get_prediction_api():
@@ -95,73 +126,100 @@ def get_database():
     """Get or create database connection"""
     global db
     if db is None:
-        # Check if PredictionDatabase is available
-        if PredictionDatabase is None:
-            print("Warning: PredictionDatabase not available (psycopg2 not installed)")
-            return None
-        
-        db_port = os.environ.get('DB_PORT', '5432')
-        try:
-            db_port = int(db_port)
-        except (ValueError, TypeError):
-            db_port = 5432  # Default to 5432 if invalid
-        
-        # Try to get credentials from Secrets Manager first, fallback to environment variables
-        db_user = None
-        db_password = None
-        db_name = os.environ.get('DB_NAME', 'diamonddrip')
-        
-        secret_arn = os.environ.get('DB_SECRET_ARN')
-        if secret_arn:
-            print(f"Attempting to retrieve credentials from Secrets Manager: {secret_arn}")
-            secret_creds = get_secrets_manager_credentials(secret_arn)
-            if secret_creds:
-                db_user = secret_creds.get('user')
-                db_password = secret_creds.get('password')
-                if secret_creds.get('database'):
-                    db_name = secret_creds.get('database')
-                print("Successfully retrieved credentials from Secrets Manager")
-        
-        # Fallback to environment variables if Secrets Manager didn't provide credentials
-        if not db_user:
-            db_user = os.environ.get('DB_USER')
-        if not db_password:
-            db_password = os.environ.get('DB_PASSWORD')
-        
-        db_config = {
-            'host': os.environ.get('DB_HOST'),
-            'port': db_port,
-            'database': db_name,
-            'user': db_user,
-            'password': db_password,
-        }
-        
-        # Check which config values are missing
-        missing_config = [key for key, value in db_config.items() if not value]
-        if missing_config:
-            print(f"Warning: Database configuration incomplete. Missing: {', '.join(missing_config)}")
-            print(f"  DB_HOST: {'set' if db_config['host'] else 'NOT SET'}")
-            print(f"  DB_PORT: {db_config['port']}")
-            print(f"  DB_NAME: {db_config['database']}")
-            print(f"  DB_USER: {'set' if db_config['user'] else 'NOT SET'}")
-            print(f"  DB_PASSWORD: {'set' if db_config['password'] else 'NOT SET'}")
-            print(f"  DB_SECRET_ARN: {'set' if secret_arn else 'NOT SET'}")
-            db = None
-        else:
-            try:
-                print(f"Attempting to connect to RDS database: {db_config['host']}:{db_config['port']}/{db_config['database']} as {db_config['user']}")
-                # Use longer timeout for VPC connections (10 seconds)
-                db = PredictionDatabase(**db_config, connect_timeout=10)
-                print("Database connection established successfully")
-            except Exception as e:
-                import traceback
-                print(f"Error connecting to database: {e}")
-                print(f"Traceback: {traceback.format_exc()}")
-                print("Lambda will continue without database functionality")
-                db = None  # Set to None so we don't keep retrying on every invocation
-    
+        # Serialize connection setup so concurrent callers (e.g. the pulse thread)
+        # don't each open their own pool
+        with db_lock:
+            if db is None:
+                db = connect_database()
     return db
 
+def connect_database():
+    """Create a database connection from Secrets Manager / environment configuration
+    
+    Returns:
+        PredictionDatabase instance, or None if unavailable
+    """
+    # Import database adapter (RDS PostgreSQL) on first use
+    try:
+        from database import PredictionDatabase
+    except ImportError:
+        # Fallback for local testing
+        print("Warning: PredictionDatabase not available (psycopg2 not installed)")
+        return None
+    
+    db_port = os.environ.get('DB_PORT', '5432')
+    try:
+        db_port = int(db_port)
+    except (ValueError, TypeError):
+        db_port = 5432  # Default to 5432 if invalid
+    
+    # Upper bound on pooled connections per container (each one is a Postgres session)
+    db_pool_max = os.environ.get('DB_POOL_MAX', '5')
+    try:
+        db_pool_max = max(1, int(db_pool_max))
+    except (ValueError, TypeError):
+        db_pool_max = 5  # Default to 5 if invalid
+    
+    # Try to get credentials from Secrets Manager first, fallback to environment variables
+    db_user = None
+    db_password = None
+    db_name = os.environ.get('DB_NAME', 'diamonddrip')
+    
+    secret_arn = os.environ.get('DB_SECRET_ARN')
+    if secret_arn:
+        print(f"Attempting to retrieve credentials from Secrets Manager: {secret_arn}")
+        secret_creds = get_secrets_manager_credentials(secret_arn)
+        if secret_creds:
+            db_user = secret_creds.get('user')
+            db_password = secret_creds.get('password')
+            if secret_creds.get('database'):
+                db_name = secret_creds.get('database')
+            print("Successfully retrieved credentials from Secrets Manager")
+    
+    # Fallback to environment variables if Secrets Manager didn't provide credentials
+    if not db_user:
+        db_user = os.environ.get('DB_USER')
+    if not db_password:
+        db_password = os.environ.get('DB_PASSWORD')
+    
+    # Prefer an RDS Proxy endpoint when configured - the proxy holds warm,
+    # authenticated connections to RDS, so cold starts skip the full Postgres handshake
+    proxy_host = os.environ.get('DB_PROXY_HOST')
+    
+    db_config = {
+        'host': proxy_host or os.environ.get('DB_HOST'),
+        'port': db_port,
+        'database': db_name,
+        'user': db_user,
+        'password': db_password,
+    }
+    
+    # Check which config values are missing
+    missing_config = [key for key, value in db_config.items() if not value]
+    if missing_config:
+        print(f"Warning: Database configuration incomplete. Missing: {', '.join(missing_config)}")
+        print(f"  DB_HOST: {'set' if db_config['host'] else 'NOT SET'}")
+        print(f"  DB_PROXY_HOST: {'set' if proxy_host else 'NOT SET'}")
+        print(f"  DB_PORT: {db_config['port']}")
+        print(f"  DB_NAME: {db_config['database']}")
+        print(f"  DB_USER: {'set' if db_config['user'] else 'NOT SET'}")
+        print(f"  DB_PASSWORD: {'set' if db_config['password'] else 'NOT SET'}")
+        print(f"  DB_SECRET_ARN: {'set' if secret_arn else 'NOT SET'}")
+        return None
+    
+    try:
+        print(f"Attempting to connect to RDS database: {db_config['host']}:{db_config['port']}/{db_config['database']} as {db_config['user']}")
+        # Use longer timeout for VPC connections (10 seconds)
+        # RDS Proxy supports TLS on every endpoint, so always require it there
+        database = PredictionDatabase(**db_config, pool_size=db_pool_max, connect_timeout=10,
+                                      sslmode='require' if proxy_host else None)
+        print("Database connection established successfully")
+        return database
+    except Exception as e:
+        logger.exception("Error connecting to database: %s", e)
+        print("Lambda will continue without database functionality")
+        return None
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     AWS Lambda handler for API Gateway requests
@@ -179,9 +237,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         # Strip API Gateway stage prefix if present (e.g., /production, /dev, /staging)
         # The stage is part of the path in the rawPath, so we need to strip it
-        # Common stages: production, dev, staging, test, etc.
+        # Common stages: production, dev, staging, test, etc. (see API_STAGES)
         path_parts = path.split('/', 2)  # Split into ['', 'stage', 'actual/path'] or ['', 'stage']
-        if len(path_parts) >= 2 and path_parts[1] in ['production', 'dev', 'staging', 'test', 'beta', 'alpha']:
+        if len(path_parts) >= 2 and path_parts[1] in API_STAGES:
             # This is a stage prefix, remove it
             if len(path_parts) >= 3:
                 path = '/' + path_parts[2]  # Reconstruct path without stage
@@ -192,83 +250,19 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if path != '/' and path.endswith('/'):
             path = path.rstrip('/')
         
-        # Debug logging (can be removed in production)
-        print(f"Request: {http_method} {path}")
-        print(f"Event keys: {list(event.keys())}")
-        if 'rawPath' in event:
-            print(f"rawPath: {event.get('rawPath')}")
-        if 'path' in event:
-            print(f"path: {event.get('path')}")
+        # Debug logging (set LOG_LEVEL=DEBUG to enable)
+        logger.debug("Request: %s %s", http_method, path)
         
         # Handle CORS preflight
         if http_method == 'OPTIONS':
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Max-Age': '86400'
-                },
-                'body': ''
-            }
+            return CORS_PREFLIGHT_RESPONSE
         
         # Route requests (path is already normalized, no trailing slash except root)
-        if path == '/prediction':
-            if http_method == 'POST':
-                return handle_prediction_post(event)
-            elif http_method == 'GET':
-                return handle_prediction_get()
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/stats':
-            if http_method == 'GET':
-                return handle_stats_get()
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/recent' or path.startswith('/recent'):
-            if http_method == 'GET':
-                return handle_recent_get(event)
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/sources':
-            if http_method == 'GET':
-                return handle_sources_get()
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/predict_phrase':
-            if http_method == 'POST':
-                return handle_predict_phrase_post(event)
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/' or path == '/health':
-            return handle_health_check()
-        
-        # Debug endpoints for prediction visualizer
-        elif path == '/prediction/debug/state':
-            if http_method == 'GET':
-                return handle_debug_state()
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
+        methods = ROUTES.get(path)
+        if methods is None:
+            methods = next((m for prefix, m in PREFIX_ROUTES if path.startswith(prefix)), None)
         
-        elif path == '/prediction/debug/pipeline' or path.startswith('/prediction/debug/pipeline'):
-            if http_method == 'GET':
-                return handle_debug_pipeline(event)
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        elif path == '/prediction/debug/history' or path.startswith('/prediction/debug/history'):
-            if http_method == 'GET':
-                return handle_debug_history(event)
-            else:
-                return create_response(405, {'error': 'Method not allowed'})
-        
-        else:
+        if methods is None:
             # Return 404 with debug info
             return create_response(404, {
                 'error': 'Not found',
@@ -276,17 +270,18 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'method': http_method,
                 'available_paths': ['/prediction', '/predict_phrase', '/stats', '/recent', '/health', '/', '/prediction/debug/state', '/prediction/debug/pipeline', '/prediction/debug/history']
             })
+        
+        handler = methods.get(http_method) or methods.get('*')
+        if handler is None:
+            return create_response(405, {'error': 'Method not allowed'})
+        return handler(event)
     
     except Exception as e:
         # Catch any unhandled exceptions to prevent Lambda crashes
-        import traceback
-        error_msg = str(e)
-        traceback_str = traceback.format_exc()
-        print(f"Unhandled exception in lambda_handler: {error_msg}")
-        print(f"Traceback: {traceback_str}")
+        logger.exception("Unhandled exception in lambda_handler: %s", e)
         return create_response(500, {
             'error': 'Internal server error',
-            'message': error_msg
+            'message': str(e)
         })
 
 def extract_pulses_from_patterns(body: Dict[str, Any], client_timestamp_str: str, source_id: Optional[int] = None) -> List[Tuple[int, float, datetime, Optional[int]]]:
@@ -361,6 +356,10 @@ def extract_pulses_from_patterns(body: Dict[str, Any], client_timestamp_str: str
         phrase_duration_seconds = beat_duration_seconds * BEATS_PER_PHRASE
         thirty_second_note_duration_seconds = beat_duration_seconds / 8.0
         
+        # Offset of each 32nd-note slot within a phrase - the same for every pattern in the request
+        slot_offsets = [timedelta(seconds=slot_idx * thirty_second_note_duration_seconds)
+                        for slot_idx in range(SLOTS_PER_PATTERN)]
+        
         # Process ACTUAL patterns (most recent first)
         # Each pattern in recentPulsePatterns represents an actual phrase that occurred
         # We calculate timestamps going backwards from the client timestamp
@@ -373,6 +372,8 @@ def extract_pulses_from_patterns(body: Dict[str, Any], client_timestamp_str: str
             durations = None
             if recent_durations and isinstance(recent_durations, list) and len(recent_durations) > pattern_idx:
                 durations = recent_durations[len(recent_durations) - 1 - pattern_idx]
+            if not (durations and isinstance(durations, list)):
+                durations = None
             
             # Calculate phrase start time (going backwards from client timestamp)
             # Most recent phrase ends just before client timestamp
@@ -387,12 +388,11 @@ def extract_pulses_from_patterns(body: Dict[str, Any], client_timestamp_str: str
                 if is_pulse:
                     # Calculate pulse timestamp within the phrase
                     # Each slot represents a 32nd note position
-                    slot_offset_seconds = slot_idx * thirty_second_note_duration_seconds
-                    pulse_timestamp = phrase_start_time + timedelta(seconds=slot_offset_seconds)
+                    pulse_timestamp = phrase_start_time + slot_offsets[slot_idx]
                     
                     # Get ACTUAL duration if available (from sustained beat detection)
                     duration_ms = None
-                    if durations and isinstance(durations, list) and slot_idx < len(durations):
+                    if durations is not None and slot_idx < len(durations):
                         duration_32nd = durations[slot_idx]
                         if duration_32nd is not None and duration_32nd > 0:
                             # Convert 32nd note duration to milliseconds
@@ -405,9 +405,7 @@ def extract_pulses_from_patterns(body: Dict[str, Any], client_timestamp_str: str
                     pulses.append((source_id, current_bpm, pulse_timestamp, duration_ms))
         
     except Exception as e:
-        print(f"Error extracting pulses from patterns: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error extracting pulses from patterns: %s", e)
     
     return pulses
 
@@ -434,9 +432,7 @@ def process_pulses_async(body: Dict[str, Any], client_timestamp_str: str, hashed
         inserted_count = db.insert_pulse_timestamps(pulses)
         print(f"Processed and stored {inserted_count} pulse timestamps for source_id={source_id}")
     except Exception as e:
-        print(f"Error in async pulse processing: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in async pulse processing: %s", e)
 
 def handle_prediction_post(event: Dict[str, Any]) -> Dict[str, Any]:
     """Handle POST /prediction requests"""
@@ -444,7 +440,7 @@ def handle_prediction_post(event: Dict[str, Any]) -> Dict[str, Any]:
         # Parse request body
         if 'body' in event:
             if isinstance(event['body'], str):
-                body = json.loads(event['body'])
+                body = loads_json(event['body'])
             else:
                 body = event['body']
         else:
@@ -455,36 +451,36 @@ def handle_prediction_post(event: Dict[str, Any]) -> Dict[str, Any]:
         source_ip = request_context.get('identity', {}).get('sourceIp', 'unknown')
         user_agent = event.get('headers', {}).get('User-Agent', event.get('headers', {}).get('user-agent', 'unknown'))
         
-        # Extract device type and browser
-        device_type, browser = extract_device_info(user_agent)
-        
         # Hash IP with device type and browser as salt
-        salt_string = f"{source_ip}:{device_type}:{browser}"
-        hashed_ip = hashlib.sha256(salt_string.encode('utf-8')).hexdigest()
+        hashed_ip = hash_client(source_ip, user_agent)
         
         # Store in database
-        server_timestamp = datetime.utcnow().isoformat()
+        server_timestamp = utc_now_iso()
         client_timestamp = body.get('timestamp', 'not provided')
         avg_bpm_last_20s = None
         
+        # Process pulses on a worker thread, overlapping with the prediction insert below
+        pulse_future = None
+        if client_timestamp != 'not provided' and hashed_ip:
+            pulse_future = pulse_executor.submit(process_pulses_async, body, client_timestamp, hashed_ip)
+        
         db = get_database()
         if db is not None:
             try:
-                db.insert_prediction(client_timestamp, server_timestamp, body, hashed_ip)
-                avg_bpm_last_20s, count = db.get_average_bpm_last_20_seconds()
-                unique_sources = db.get_unique_sources_last_20_seconds()
-                print(f"[{server_timestamp}] Average BPM (last 20s): {avg_bpm_last_20s:.2f if avg_bpm_last_20s else 'N/A'} (from {count} predictions, {unique_sources} unique sources)")
+                avg_bpm_last_20s, count, unique_sources = cache_window_stats(db.insert_prediction_and_get_window_stats(
+                    client_timestamp, server_timestamp, body, hashed_ip
+                ))
+                avg_display = f"{avg_bpm_last_20s:.2f}" if avg_bpm_last_20s is not None else 'N/A'
+                print(f"[{server_timestamp}] Average BPM (last 20s): {avg_display} (from {count} predictions, {unique_sources} unique sources)")
             except Exception as e:
                 print(f"[{server_timestamp}] Warning: Failed to store in database: {e}")
         
-        # Process pulses asynchronously (don't block response)
-        if client_timestamp != 'not provided' and hashed_ip:
-            thread = threading.Thread(
-                target=process_pulses_async,
-                args=(body, client_timestamp, hashed_ip),
-                daemon=True
-            )
-            thread.start()
+        # Finish pulse storage before responding - the container may be frozen right after
+        if pulse_future is not None:
+            try:
+                pulse_future.result(timeout=PULSE_WAIT_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                print(f"[{server_timestamp}] Warning: Pulse processing still running after {PULSE_WAIT_TIMEOUT_SECONDS}s")
         
         # Return success response
         return create_response(200, {
@@ -506,7 +502,7 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
         # Check if prediction engine is available
         print(f"[PREDICT_PHRASE] PREDICTION_ENGINE_AVAILABLE = {PREDICTION_ENGINE_AVAILABLE}")
         if not PREDICTION_ENGINE_AVAILABLE:
-            server_timestamp = datetime.utcnow().isoformat()
+            server_timestamp = utc_now_iso()
             print(f"[PREDICT_PHRASE] Prediction engine not available, returning error")
             return create_response(503, {
                 'status': 'error',
@@ -518,7 +514,7 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
         # Parse request body
         if 'body' in event:
             if isinstance(event['body'], str):
-                body = json.loads(event['body'])
+                body = loads_json(event['body'])
             else:
                 body = event['body']
         else:
@@ -536,9 +532,7 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
         source_ip = request_context.get('identity', {}).get('sourceIp', 'unknown')
         user_agent = event.get('headers', {}).get('User-Agent', event.get('headers', {}).get('user-agent', 'unknown'))
         
-        device_type, browser = extract_device_info(user_agent)
-        salt_string = f"{source_ip}:{device_type}:{browser}"
-        hashed_ip = hashlib.sha256(salt_string.encode('utf-8')).hexdigest()
+        hashed_ip = hash_client(source_ip, user_agent)
         
         # Add device_id to body if not present (for prediction API)
         if 'device_id' not in body:
@@ -547,7 +541,7 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
         # Get prediction API instance
         api = get_prediction_api()
         if api is None:
-            server_timestamp = datetime.utcnow().isoformat()
+            server_timestamp = utc_now_iso()
             return create_response(503, {
                 'status': 'error',
                 'error': 'Prediction API not initialized',
@@ -561,7 +555,7 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
         print(f"[PREDICT_PHRASE] Prediction API returned: status={result.get('status')}")
         
         # Add server timestamp to response
-        server_timestamp = datetime.utcnow().isoformat()
+        server_timestamp = utc_now_iso()
         result['server_timestamp'] = server_timestamp
         
         # Return appropriate status code based on result
@@ -574,10 +568,8 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
     except json.JSONDecodeError as e:
         return create_response(400, {'error': 'Invalid JSON', 'details': str(e)})
     except Exception as e:
-        print(f"Error handling predict_phrase: {e}")
-        import traceback
-        traceback.print_exc()
-        server_timestamp = datetime.utcnow().isoformat()
+        logger.exception("Error handling predict_phrase: %s", e)
+        server_timestamp = utc_now_iso()
         return create_response(500, {
             'status': 'error',
             'error': 'Internal server error',
@@ -585,6 +577,32 @@ def handle_predict_phrase_post(event: Dict[str, Any]) -> Dict[str, Any]:
             'server_timestamp': server_timestamp
         })
 
+# Last-20-second stats (reused across Lambda invocations). The window moves slowly, so
+# GET /prediction serves a result up to WINDOW_STATS_TTL_SECONDS old instead of re-querying;
+# POST /prediction refreshes it with the stats computed alongside its insert.
+WINDOW_STATS_TTL_SECONDS = 1.0
+window_stats_cache = None  # ((avg_bpm, count, unique_sources), fetched_at)
+
+def cache_window_stats(stats: Tuple[Optional[float], int, int]) -> Tuple[Optional[float], int, int]:
+    """Store freshly computed window stats and return them"""
+    global window_stats_cache
+    window_stats_cache = (stats, time.monotonic())
+    return stats
+
+def get_window_stats(db) -> Tuple[Optional[float], int, int]:
+    """Get (avg_bpm, count, unique_sources) for the last 20 seconds (cached for WINDOW_STATS_TTL_SECONDS)"""
+    cached = window_stats_cache
+    if cached and time.monotonic() - cached[1] < WINDOW_STATS_TTL_SECONDS:
+        return cached[0]
+    
+    avg_bpm, count = db.get_average_bpm_last_20_seconds()
+    unique_sources = db.get_unique_sources_last_20_seconds()
+    return cache_window_stats((avg_bpm, count, unique_sources))
+
+# Successful aggregate reads (GET /prediction, GET /stats) may be reused by browsers and any
+# CDN in front of the API for a second - the underlying 20-second window barely moves in that time
+AGGREGATE_CACHE_HEADERS = {'Cache-Control': 'public, max-age=1, stale-while-revalidate=5'}
+
 def handle_prediction_get() -> Dict[str, Any]:
     """Handle GET /prediction requests - returns latest averaged BPM"""
     db = get_database()
@@ -596,8 +614,7 @@ def handle_prediction_get() -> Dict[str, Any]:
         })
     
     try:
-        avg_bpm_last_20s, count = db.get_average_bpm_last_20_seconds()
-        unique_sources = db.get_unique_sources_last_20_seconds()
+        avg_bpm_last_20s, count, unique_sources = get_window_stats(db)
         
         return create_response(200, {
             'status': 'ok',
@@ -606,7 +623,7 @@ def handle_prediction_get() -> Dict[str, Any]:
             'avg_bpm_last_20s': round(avg_bpm_last_20s, 2) if avg_bpm_last_20s is not None else None,
             'prediction_count': count,
             'unique_sources': unique_sources
-        })
+        }, headers=AGGREGATE_CACHE_HEADERS)
     except Exception as e:
         print(f"Error getting average BPM: {e}")
         return create_response(500, {
@@ -623,7 +640,7 @@ def handle_stats_get() -> Dict[str, Any]:
     
     try:
         stats = db.get_statistics()
-        return create_response(200, stats)
+        return create_response(200, stats, headers=AGGREGATE_CACHE_HEADERS)
     except Exception as e:
         return create_response(500, {'error': str(e)})
 
@@ -669,33 +686,60 @@ def handle_sources_get() -> Dict[str, Any]:
     except Exception as e:
         return create_response(500, {'error': str(e)})
 
-def handle_health_check() -> Dict[str, Any]:
-    """Handle health check requests"""
-    global db
-    db = get_database()
+def ensure_live_database():
+    """Get the database after checking the connection with SELECT 1, reconnecting once if it's dead
     
-    # Test database connection if available
-    database_status = 'not available'
-    if db is not None:
+    Returns:
+        Tuple of (db, error) - db is None if unavailable; error is the last liveness failure
+    """
+    global db
+    error = None
+    for attempt in range(2):
+        current = get_database()
+        if current is None:
+            break
         try:
-            # Test connection by executing a simple query
-            with db.get_connection() as conn:
+            with current.get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute('SELECT 1')
                     cursor.fetchone()
-            database_status = 'connected'
+            return current, None
         except Exception as e:
-            print(f"Health check: Database connection test failed: {e}")
-            database_status = f'connection failed: {str(e)}'
-            # Reset db to None so it will retry on next invocation
-            db = None
+            print(f"Database liveness check failed (attempt {attempt + 1}): {e}")
+            error = e
+            # Drop the dead connection so get_database() reconnects - unless another
+            # caller already replaced it, in which case reuse their reconnect
+            with db_lock:
+                if db is current:
+                    db = None
+    return None, error
+
+def handle_health_check() -> Dict[str, Any]:
+    """Handle health check requests"""
+    live_db, error = ensure_live_database()
     
-    return create_response(200, {
+    if live_db is not None:
+        database_status = 'connected'
+    elif error is not None:
+        database_status = f'connection failed: {str(error)}'
+    else:
+        database_status = 'not available'
+    
+    body = HEALTH_BODIES.get(database_status)
+    if body is None:
+        body = health_body(database_status)
+    return create_response(200, body)
+
+def health_body(database_status: str) -> str:
+    """Serialize the health check body"""
+    return dumps_json({
         'status': 'ok',
         'service': 'diamonddrip-prediction-server',
         'database': database_status
     })
 
+# Clients resend the same User-Agent on every request, so classify each one once
+@lru_cache(maxsize=1024)
 def extract_device_info(user_agent: str) -> tuple:
     """Extract device type and browser from User-Agent"""
     user_agent_lower = user_agent.lower()
@@ -728,6 +772,28 @@ def extract_device_info(user_agent: str) -> tuple:
     
     return device_type, browser
 
+# Formatted seconds part of the last timestamp - requests within one second reuse it
+iso_second_cache = (None, '')  # (unix seconds, 'YYYY-MM-DDTHH:MM:SS')
+
+def utc_now_iso() -> str:
+    """Current UTC time as a naive ISO 8601 string, same format as datetime.utcnow().isoformat()"""
+    global iso_second_cache
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    if seconds != iso_second_cache[0]:
+        iso_second_cache = (seconds, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)))
+    micros = nanos // 1000
+    # isoformat() omits the fraction when it is zero
+    return f"{iso_second_cache[1]}.{micros:06d}" if micros else iso_second_cache[1]
+
+# The hash is the stored source identity, so it must stay SHA-256 over the same
+# salt string. A client sends many requests, so cache the digest per (IP, User-Agent).
+@lru_cache(maxsize=8192)
+def hash_client(source_ip: str, user_agent: str) -> str:
+    """Hash a client IP salted with the device type and browser from its User-Agent"""
+    device_type, browser = extract_device_info(user_agent)
+    salt_string = f"{source_ip}:{device_type}:{browser}"
+    return hashlib.sha256(salt_string.encode('utf-8')).hexdigest()
+
 def handle_debug_state() -> Dict[str, Any]:
     """Handle GET /prediction/debug/state requests"""
     if not PREDICTION_ENGINE_AVAILABLE:
@@ -825,23 +891,89 @@ def handle_debug_history(event: Dict[str, Any]) -> Dict[str, Any]:
             'message': str(e)
         })
 
+# API Gateway stage names stripped from the front of the request path
+API_STAGES = frozenset(('production', 'dev', 'staging', 'test', 'beta', 'alpha'))
+
+# Route table: path -> {method: handler(event)}; '*' accepts any method.
+# Built once at import so each request is a dict lookup instead of an if/elif chain.
+ROUTES = {
+    '/prediction': {
+        'POST': handle_prediction_post,
+        'GET': lambda event: handle_prediction_get()
+    },
+    '/stats': {'GET': lambda event: handle_stats_get()},
+    '/sources': {'GET': lambda event: handle_sources_get()},
+    '/predict_phrase': {'POST': handle_predict_phrase_post},
+    '/': {'*': lambda event: handle_health_check()},
+    '/health': {'*': lambda event: handle_health_check()},
+    # Debug endpoints for prediction visualizer
+    '/prediction/debug/state': {'GET': lambda event: handle_debug_state()}
+}
+
+# Routes matched by prefix (checked in order when there is no exact match)
+PREFIX_ROUTES = (
+    ('/recent', {'GET': handle_recent_get}),
+    ('/prediction/debug/pipeline', {'GET': handle_debug_pipeline}),
+    ('/prediction/debug/history', {'GET': handle_debug_history})
+)
+
+def loads_json(data: str) -> Any:
+    """Parse a JSON request body (raises json.JSONDecodeError on bad input either way)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_json(body: Any) -> str:
+    """Serialize a response body to JSON"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(body, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits - the stdlib encoder handles (or rejects) these as before
+            pass
+    return json.dumps(body)
+
+# Headers sent with every response. Shared (not copied) when there are no overrides -
+# the runtime only serializes them, so nothing may mutate this dict.
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
 def create_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
     """Create a standardized API Gateway response"""
-    response_headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type'
-    }
-    
-    if headers:
-        response_headers.update(headers)
+    response_headers = {**DEFAULT_HEADERS, **headers} if headers else DEFAULT_HEADERS
     
     return {
         'statusCode': status_code,
         'headers': response_headers,
-        'body': json.dumps(body) if not isinstance(body, str) else body
+        'body': dumps_json(body) if not isinstance(body, str) else body
     }
 
+# Static responses, built once - the Lambda runtime serializes the returned dict
+# on every invocation, so sharing it is safe as long as nobody mutates it
+CORS_PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+# Health bodies for the common statuses (connection failures embed the error text)
+HEALTH_BODIES = {status: health_body(status) for status in ('connected', 'not available')}
 
-
+# Connect during the Lambda init phase so the first request doesn't pay for it.
+# get_database() logs and swallows connection errors; requests retry lazily.
+# The prediction API (which loads slot priors from the database) is built here too, but
+# only once connected - without a database it stays lazy so a later request builds it
+# against the recovered connection instead of keeping a database-less instance.
+if get_database() is not None:
+    try:
+        get_prediction_api()
+    except Exception as e:
+        logger.exception("Error initializing prediction API: %s", e)
@@ -7,12 +7,308 @@ import os
 import sys
 import subprocess
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 import zipfile
+import zlib
+import struct
+import hashlib
+import base64
+import json
 import tempfile
 import shutil
+import threading
+import atexit
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 
+# Linux wheels downloaded for the Lambda package are reused across builds
+WHEEL_CACHE_DIR = Path.home() / '.cache' / 'diamonddrip' / 'wheels'
+WHEEL_MANIFEST = 'manifest.json'
+
+# Adaptive retries and TCP keepalive, as in deploy-stacks.py
+BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+    max_pool_connections=20
+)
+# update_function_code can block while the service copies a large zip
+LAMBDA_CONFIG = BOTO_CONFIG.merge(Config(read_timeout=300))
+
+# dist-info files kept in the package (needed by importlib.metadata)
+DIST_INFO_KEEP = {'METADATA', 'RECORD', 'entry_points.txt'}
+
+# Prediction engine files copied from synchronizer/ into the package
+PREDICTION_FILES = [
+    'prediction_engine.py',
+    'prediction_api.py',
+    'slot_prior_model.py'
+]
+
+# Background cleanup threads, joined at exit so temp directories are not left behind
+_cleanup_threads = []
+
+def _join_cleanup_threads():
+    """Wait for background cleanup to finish before the interpreter exits"""
+    for thread in _cleanup_threads:
+        thread.join()
+
+atexit.register(_join_cleanup_threads)
+
+def remove_tree_in_background(path):
+    """Delete a directory tree on a background thread"""
+    thread = threading.Thread(
+        target=shutil.rmtree,
+        args=(path,),
+        kwargs={'ignore_errors': True},
+        daemon=True
+    )
+    thread.start()
+    _cleanup_threads.append(thread)
+    return thread
+
+def _deflate_file(file_path, arcname, level=1):
+    """Read and raw-deflate a single file for the package
+    
+    zlib releases the GIL while compressing, so this runs in parallel on a
+    thread pool without the pickling/spawn cost of a process pool.
+    
+    Returns:
+        tuple: (ZipInfo with sizes and CRC filled in, compressed bytes)
+    """
+    # strict_timestamps=False clamps pre-1980 mtimes (common in wheel contents)
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname, strict_timestamps=False)
+    data = Path(file_path).read_bytes()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    zinfo.CRC = zlib.crc32(data)
+    return zinfo, compressed
+
+def _write_compressed_entry(zipf, zinfo, data):
+    """Append an already-compressed entry to an open ZipFile
+    
+    zipfile has no public API for writing pre-compressed data, so this mirrors
+    what ZipFile.open(..., 'w') does on open and close without recompressing.
+    """
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+
+def _wheel_member_target(name):
+    """Map a wheel member to its path in the package, or None to skip it
+    
+    Mirrors what 'pip install -t' lays out: .data/purelib and .data/platlib are
+    merged into the root, other .data schemes (scripts, headers, data) are dropped.
+    """
+    top, _, rest = name.partition('/')
+    if not top.endswith('.data'):
+        return name
+    scheme, _, path = rest.partition('/')
+    if scheme in ('purelib', 'platlib') and path:
+        return path
+    return None
+
+def _is_needed_in_package(arcname):
+    """Return False for files Lambda never loads
+    
+    Bytecode caches (stale for the Lambda runtime anyway), type stubs, and
+    dist-info metadata other than what importlib.metadata reads are skipped.
+    """
+    parts = arcname.split('/')
+    if '__pycache__' in parts or arcname.endswith(('.pyc', '.pyi')):
+        return False
+    if any(part.endswith('.dist-info') for part in parts[:-1]):
+        return parts[-1] in DIST_INFO_KEEP
+    return True
+
+def _copy_wheel_entries(zipf, wheel_path):
+    """Copy a wheel's members into the package without decompressing them
+    
+    Wheels are already deflate-compressed zips, so the raw compressed bytes of
+    each member are copied as-is instead of extracting to disk and recompressing.
+    """
+    with zipfile.ZipFile(wheel_path) as wheel, open(wheel_path, 'rb') as fp:
+        for src_info in wheel.infolist():
+            if src_info.is_dir():
+                continue
+            arcname = _wheel_member_target(src_info.filename)
+            if arcname is None or not _is_needed_in_package(arcname):
+                continue
+            
+            # Skip the member's local header to reach its compressed data
+            fp.seek(src_info.header_offset)
+            fheader = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))
+            fp.seek(fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+            data = fp.read(src_info.compress_size)
+            
+            zinfo = zipfile.ZipInfo(arcname, date_time=src_info.date_time)
+            zinfo.compress_type = src_info.compress_type
+            zinfo.external_attr = src_info.external_attr
+            zinfo.file_size = src_info.file_size
+            zinfo.compress_size = src_info.compress_size
+            zinfo.CRC = src_info.CRC
+            _write_compressed_entry(zipf, zinfo, data)
+
+def _zip_directory(src, dst):
+    """Zip the needed contents of src into a new archive at dst (deflate level 1)
+    
+    Uses the system zip binary when it is on PATH - it is much faster than
+    zipfile for many small files. Otherwise files are compressed in parallel
+    on a thread pool and appended in a stable order.
+    
+    Level 1 deflate: most of the package is compiled wheel content that barely
+    shrinks at higher levels, so the default level 6 only costs build time.
+    """
+    src = Path(src)
+    dst = Path(dst).resolve()
+    if dst.exists():
+        dst.unlink()  # zip -r would otherwise update the old archive in place
+    
+    package_files = []
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if d != '__pycache__']
+        for file in files:
+            file_path = Path(root) / file
+            arcname = file_path.relative_to(src).as_posix()
+            if _is_needed_in_package(arcname):
+                package_files.append((file_path, arcname))
+    
+    zip_binary = shutil.which('zip')
+    if zip_binary:
+        subprocess.run(
+            [zip_binary, '-q', '-D', '-1', str(dst), '-@'],
+            cwd=src,
+            input='\n'.join(arcname for _, arcname in package_files),
+            text=True,
+            check=True
+        )
+        return
+    
+    with zipfile.ZipFile(dst, 'w', zipfile.ZIP_DEFLATED, compresslevel=1,
+                         allowZip64=True, strict_timestamps=False) as zipf:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for zinfo, data in executor.map(lambda item: _deflate_file(*item), package_files):
+                _write_compressed_entry(zipf, zinfo, data)
+
+def _sha256_file(path):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_wheel_cache_dir(requirements):
+    """Get the wheel cache directory for a requirements file (keyed by its content)"""
+    key = hashlib.sha256(Path(requirements).read_bytes()).hexdigest()[:16]
+    return WHEEL_CACHE_DIR / key
+
+def load_cached_wheels(cache_dir):
+    """Load wheels from a previous build if the cache is complete and intact
+    
+    Returns:
+        list: Paths of cached wheels, or an empty list on a miss or checksum mismatch
+    """
+    manifest_file = cache_dir / WHEEL_MANIFEST
+    if not manifest_file.exists():
+        return []
+    try:
+        manifest = json.loads(manifest_file.read_text())
+        wheels = []
+        for name, digest in manifest.items():
+            wheel_path = cache_dir / name
+            if not wheel_path.exists() or _sha256_file(wheel_path) != digest:
+                print(f"WARNING:  Cached wheel {name} is missing or corrupt, downloading again")
+                return []
+            wheels.append(wheel_path)
+        return sorted(wheels)
+    except Exception as e:
+        print(f"WARNING:  Could not read wheel cache: {e}")
+        return []
+
+def get_linux_wheels(requirements):
+    """Get Linux wheels for requirements, downloading only on a cache miss
+    
+    Wheels are cached under WHEEL_CACHE_DIR, keyed by the requirements file
+    content, with a SHA-256 manifest so a corrupt cache is detected and replaced.
+    Delete the cache directory to pick up newer versions of unpinned requirements.
+    
+    Returns:
+        list: Paths of wheels, or an empty list if the download failed
+    """
+    cache_dir = get_wheel_cache_dir(requirements)
+    wheels = load_cached_wheels(cache_dir)
+    if wheels:
+        print(f"Using cached Linux wheels from {cache_dir}")
+        return wheels
+    
+    # Upgrade pip first to ensure we have the latest wheel support
+    subprocess.run(
+        [sys.executable, '-m', 'pip', 'install', '--upgrade', 'pip'],
+        check=True,
+        capture_output=True
+    )
+    
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    download_cmd = [
+        sys.executable, '-m', 'pip', 'download',
+        '--platform', 'manylinux2014_x86_64',
+        '--only-binary', ':all:',
+        '--python-version', '3.11',
+        '--implementation', 'cp',
+        '--abi', 'cp311',
+        '-r', str(requirements),
+        '-d', str(cache_dir),
+        '--quiet'
+    ]
+    
+    print(f"Downloading Linux-compatible wheels...")
+    download_result = subprocess.run(
+        download_cmd,
+        check=False,  # Don't fail if download doesn't work
+        capture_output=True,
+        text=True
+    )
+    
+    wheels = sorted(cache_dir.glob('*.whl'))
+    if download_result.returncode != 0 or not wheels:
+        return []
+    
+    manifest = {wheel_path.name: _sha256_file(wheel_path) for wheel_path in wheels}
+    (cache_dir / WHEEL_MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return wheels
+
+def _package_source_digest(script_dir):
+    """Digest of every input to the package (Lambda sources, prediction engine, requirements)
+    
+    blake2b is in the stdlib and far faster than the file reads it follows.
+    """
+    sources = [
+        script_dir / 'lambda_function.py',
+        script_dir / 'database.py',
+        script_dir / 'requirements.txt'
+    ]
+    sources += [script_dir.parent / 'synchronizer' / filename for filename in PREDICTION_FILES]
+    
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sources:
+        digest.update(path.name.encode('utf-8'))
+        digest.update(path.read_bytes() if path.exists() else b'')
+    return digest.hexdigest()
+
 def build_lambda_package(output_zip=None):
     """Build Lambda deployment package
     
@@ -24,6 +320,16 @@ def build_lambda_package(output_zip=None):
     else:
         output_zip = Path(output_zip)
     
+    # Get script directory
+    script_dir = Path(__file__).parent
+    
+    # Skip the build entirely if nothing that goes into the package has changed
+    digest_file = output_zip.with_name(output_zip.name + '.sha')
+    source_digest = _package_source_digest(script_dir)
+    if output_zip.exists() and digest_file.exists() and digest_file.read_text().strip() == source_digest:
+        print(f"No changes since last build, reusing {output_zip}")
+        return output_zip
+    
     print(f"Building Lambda deployment package...")
     
     # Create temporary directory
@@ -31,9 +337,6 @@ def build_lambda_package(output_zip=None):
     print(f"Using temp directory: {temp_dir}")
     
     try:
-        # Get script directory
-        script_dir = Path(__file__).parent
-        
         # Copy Lambda function files
         lambda_function = script_dir / 'lambda_function.py'
         database = script_dir / 'database.py'
@@ -46,6 +349,14 @@ def build_lambda_package(output_zip=None):
             print(f"ERROR: Error: database.py not found at {database}")
             return None
         
+        # Start fetching Linux wheels (network-bound) while the source files are copied
+        requirements = script_dir / 'requirements.txt'
+        wheels_future = None
+        if requirements.exists():
+            prep = ThreadPoolExecutor(max_workers=1)
+            wheels_future = prep.submit(get_linux_wheels, requirements)
+            prep.shutdown(wait=False)
+        
         print(f"Copying Lambda function files...")
         shutil.copy2(lambda_function, temp_dir / 'lambda_function.py')
         shutil.copy2(database, temp_dir / 'database.py')
@@ -53,14 +364,9 @@ def build_lambda_package(output_zip=None):
         # Copy prediction engine files from synchronizer/
         project_root = script_dir.parent
         synchronizer_dir = project_root / 'synchronizer'
-        prediction_files = [
-            'prediction_engine.py',
-            'prediction_api.py',
-            'slot_prior_model.py'
-        ]
         
         print(f"Copying prediction engine files...")
-        for filename in prediction_files:
+        for filename in PREDICTION_FILES:
             src_file = synchronizer_dir / filename
             if src_file.exists():
                 shutil.copy2(src_file, temp_dir / filename)
@@ -69,56 +375,22 @@ def build_lambda_package(output_zip=None):
                 print(f"WARNING:  Warning: {filename} not found at {src_file}")
         
         # Install dependencies
-        requirements = script_dir / 'requirements.txt'
-        if requirements.exists():
+        wheel_files = []
+        dependencies_ok = True
+        if wheels_future:
             print(f"Installing dependencies from {requirements}...")
             try:
-                # Upgrade pip first to ensure we have the latest wheel support
-                subprocess.run(
-                    [sys.executable, '-m', 'pip', 'install', '--upgrade', 'pip'],
-                    check=True,
-                    capture_output=True
-                )
-                
                 # Build pip install command for Lambda (Linux)
                 # Use --platform to download Linux wheels even when building on Windows/Mac
                 # This ensures psycopg2-binary and other packages are Linux-compatible
                 
-                # First, try to download Linux wheels to a temp directory
-                download_dir = temp_dir / 'wheels'
-                download_dir.mkdir(exist_ok=True)
-                
-                download_cmd = [
-                    sys.executable, '-m', 'pip', 'download',
-                    '--platform', 'manylinux2014_x86_64',
-                    '--only-binary', ':all:',
-                    '--python-version', '3.11',
-                    '--implementation', 'cp',
-                    '--abi', 'cp311',
-                    '-r', str(requirements),
-                    '-d', str(download_dir),
-                    '--quiet'
-                ]
+                # First, try to get Linux wheels (cached across builds, started above)
+                wheel_files = wheels_future.result()
                 
-                print(f"Downloading Linux-compatible wheels...")
-                download_result = subprocess.run(
-                    download_cmd,
-                    check=False,  # Don't fail if download doesn't work
-                    capture_output=True,
-                    text=True
-                )
-                
-                # Now install - if we downloaded wheels, install from there, otherwise try platform flag
-                if download_result.returncode == 0 and list(download_dir.glob('*.whl')):
-                    print(f"Installing from downloaded Linux wheels...")
-                    pip_cmd = [
-                        sys.executable, '-m', 'pip', 'install',
-                        '--find-links', str(download_dir),
-                        '--no-index',  # Don't look in PyPI, only use downloaded wheels
-                        '-r', str(requirements),
-                        '-t', str(temp_dir),
-                        '--quiet'
-                    ]
+                # If we have wheels, their members are copied straight into the zip
+                # below (no install/extract step); otherwise install with the platform flag
+                if wheel_files:
+                    print(f"Using {len(wheel_files)} Linux wheel(s)...")
                 else:
                     print(f"Falling back to platform-specific installation...")
                     # Fallback: try with platform flag directly
@@ -131,17 +403,19 @@ def build_lambda_package(output_zip=None):
                         '--abi', 'cp311',
                         '-r', str(requirements),
                         '-t', str(temp_dir),
+                        '--no-compile',
                         '--quiet'
                     ]
-                
-                # Install dependencies using Linux-compatible wheels
-                result = subprocess.run(
-                    pip_cmd,
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
+                    
+                    # Install dependencies using Linux-compatible wheels
+                    result = subprocess.run(
+                        pip_cmd,
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
             except subprocess.CalledProcessError as e:
+                dependencies_ok = False
                 print(f"WARNING:  Warning: Failed to install some dependencies: {e.stderr if e.stderr else str(e)}")
                 print(f"   Continuing anyway...")
         else:
@@ -149,12 +423,19 @@ def build_lambda_package(output_zip=None):
         
         # Create zip file
         print(f"Creating zip package...")
-        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = Path(root) / file
-                    arcname = file_path.relative_to(temp_dir)
-                    zipf.write(file_path, arcname)
+        _zip_directory(temp_dir, output_zip)
+        with zipfile.ZipFile(output_zip, 'a', allowZip64=True) as zipf:
+            for wheel_file in wheel_files:
+                _copy_wheel_entries(zipf, wheel_file)
+            entry_count = len(zipf.filelist)
+        print(f"  Packaged {entry_count} files")
+        
+        # Record what was built so an unchanged rebuild can be skipped.
+        # A package with missing dependencies is never reused.
+        if dependencies_ok:
+            digest_file.write_text(source_digest)
+        elif digest_file.exists():
+            digest_file.unlink()
         
         # Get file size
         size_mb = output_zip.stat().st_size / (1024 * 1024)
@@ -167,17 +448,48 @@ def build_lambda_package(output_zip=None):
         print(f"ERROR: Error building package: {e}")
         return None
     finally:
-        # Cleanup
+        # Cleanup in the background - deleting thousands of small files is slow
+        # (especially on Windows) and the deploy steps that follow don't need it
         if temp_dir.exists():
-            shutil.rmtree(temp_dir)
+            remove_tree_in_background(temp_dir)
 
-def upload_lambda_code(function_name, zip_file, region='us-east-1'):
+def upload_package_to_s3(s3_client, zip_file, bucket, function_name, package_sha=None):
+    """Upload a Lambda package to S3 under a content-addressed key
+    
+    Uses a multipart, multi-threaded transfer streamed from disk. A package that
+    is already in the bucket (same content hash) is not uploaded again.
+    
+    Returns:
+        str: S3 key of the package
+    """
+    key = f"lambda/{function_name}/{(package_sha or _sha256_file(zip_file))[:16]}.zip"
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+        print(f"Package already in s3://{bucket}/{key}, skipping upload")
+        return key
+    except s3_client.exceptions.ClientError:
+        pass
+    
+    transfer_config = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=10,
+        use_threads=True
+    )
+    print(f"Uploading {zip_file} to s3://{bucket}/{key}...")
+    s3_client.upload_file(str(zip_file), bucket, key, Config=transfer_config)
+    return key
+
+def upload_lambda_code(function_name, zip_file, region='us-east-1', session=None, s3_bucket=None):
     """Upload Lambda function code
     
     Args:
         function_name: Name of the Lambda function
         zip_file: Path to the zip file (Path object or string)
         region: AWS region
+        session: boto3 Session to create the client from (optional, e.g. shared by deploy-stacks.py)
+        s3_bucket: Bucket to stage the package in (optional, must be in the function's region).
+                   When set, Lambda pulls the code from S3 instead of receiving it inline.
         
     Returns:
         bool: True if successful, False otherwise
@@ -187,23 +499,44 @@ def upload_lambda_code(function_name, zip_file, region='us-east-1'):
     
     print(f"\nUploading Lambda code to function: {function_name}")
     
-    lambda_client = boto3.client('lambda', region_name=region)
+    lambda_client = (session or boto3).client('lambda', region_name=region, config=LAMBDA_CONFIG)
     
     try:
         # Check if function exists
         try:
-            lambda_client.get_function(FunctionName=function_name)
+            function = lambda_client.get_function(FunctionName=function_name)
         except lambda_client.exceptions.ResourceNotFoundException:
             print(f"ERROR: Error: Lambda function '{function_name}' not found")
             print(f"   Make sure the application stack is deployed first")
             return False
         
+        # An inline upload needs the whole zip in memory anyway (the API body is
+        # base64 JSON), so read it once and hash those bytes instead of the file
+        package_bytes = None if s3_bucket else Path(zip_file).read_bytes()
+        if package_bytes is not None:
+            package_sha = hashlib.sha256(package_bytes).hexdigest()
+        else:
+            package_sha = _sha256_file(zip_file)
+        
+        # CodeSha256 is the base64 SHA-256 of the deployed zip - skip identical uploads
+        if function['Configuration'].get('CodeSha256') == base64.b64encode(bytes.fromhex(package_sha)).decode():
+            print(f"Deployed code is identical to {zip_file}, skipping upload")
+            return True
+        
         # Upload code
-        print(f"Uploading {zip_file}...")
-        with open(zip_file, 'rb') as f:
+        if s3_bucket:
+            s3_client = (session or boto3).client('s3', region_name=region, config=BOTO_CONFIG)
+            s3_key = upload_package_to_s3(s3_client, zip_file, s3_bucket, function_name, package_sha)
             response = lambda_client.update_function_code(
                 FunctionName=function_name,
-                ZipFile=f.read()
+                S3Bucket=s3_bucket,
+                S3Key=s3_key
+            )
+        else:
+            print(f"Uploading {zip_file}...")
+            response = lambda_client.update_function_code(
+                FunctionName=function_name,
+                ZipFile=package_bytes
             )
         
         # Wait for update to complete
@@ -225,7 +558,7 @@ def upload_lambda_code(function_name, zip_file, region='us-east-1'):
 
 def get_lambda_function_name(stack_name, region='us-east-1'):
     """Get Lambda function name from CloudFormation stack outputs"""
-    cf = boto3.client('cloudformation', region_name=region)
+    cf = boto3.client('cloudformation', region_name=region, config=BOTO_CONFIG)
     try:
         response = cf.describe_stacks(StackName=stack_name)
         outputs = {o['OutputKey']: o['OutputValue'] 
@@ -252,6 +585,9 @@ Examples:
 
   # Upload existing package
   python upload-lambda-code.py --function-name my-function --zip-file lambda-package.zip
+
+  # Deploy via an S3 artifact bucket instead of an inline upload
+  python upload-lambda-code.py --s3-bucket my-artifact-bucket
         """
     )
     
@@ -270,6 +606,9 @@ Examples:
     parser.add_argument('--region', '-r',
                        default=os.environ.get('AWS_REGION', 'us-east-1'),
                        help='AWS region (default: us-east-1)')
+    parser.add_argument('--s3-bucket',
+                       default=os.environ.get('LAMBDA_ARTIFACT_BUCKET'),
+                       help='Stage the package in this S3 bucket and deploy from there (default: $LAMBDA_ARTIFACT_BUCKET, otherwise upload inline)')
     
     args = parser.parse_args()
     
@@ -280,13 +619,13 @@ Examples:
         stack_name = f'{args.project}-{args.env}-application'
         print(f"Using default application stack: {stack_name}")
     
-    # Determine function name
+    # Determine function name - the stack lookup runs while the package is located/built
     function_name = args.function_name
+    lookup = ThreadPoolExecutor(max_workers=1)
+    function_name_future = None
     if not function_name and stack_name:
-        function_name = get_lambda_function_name(stack_name, args.region)
-        if not function_name:
-            print(f"ERROR: Could not determine Lambda function name from stack: {stack_name}")
-            sys.exit(1)
+        function_name_future = lookup.submit(get_lambda_function_name, stack_name, args.region)
+    lookup.shutdown(wait=False)
     
     # Get zip file - prefer docker zip, then specified file, build if neither exists
     zip_file = args.zip_file
@@ -318,13 +657,19 @@ Examples:
     if not isinstance(zip_file, Path):
         zip_file = Path(zip_file)
     
+    if function_name_future:
+        function_name = function_name_future.result()
+        if not function_name:
+            print(f"ERROR: Could not determine Lambda function name from stack: {stack_name}")
+            sys.exit(1)
+    
     # Upload if function name is provided
     if not function_name:
         print(f"ERROR: Could not determine Lambda function name.")
         print(f"   Please specify --function-name, --stack-name, or ensure the default application stack exists.")
         sys.exit(1)
     
-    success = upload_lambda_code(function_name, zip_file, args.region)
+    success = upload_lambda_code(function_name, zip_file, args.region, s3_bucket=args.s3_bucket)
     if not success:
         sys.exit(1)
 